@@ -4,69 +4,124 @@ from flask_cors import CORS
 import os
 
 from models import db, migrate
-from routes_scan import bp as scan_bp
-from routes_verification import bp as verification_bp
-from routes_cards import bp as cards_bp
-from routes_shopify import bp as shopify_bp
-from routes_admin import bp as admin_bp
-from routes_collection import bp as collection_bp
-from routes_auth import bp as auth_bp, init_oauth  # <-- import init_oauth
-from routes_contact import bp as contact_bp
 
 def _normalize_db_url(url: str | None) -> str:
     if url and url.startswith("postgres://"):
         return url.replace("postgres://", "postgresql://", 1)
     return url or "sqlite:///local.db"
 
-app = Flask(__name__)
-
-# Config
-app.config["SQLALCHEMY_DATABASE_URI"] = _normalize_db_url(os.environ.get("DATABASE_URL"))
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", os.environ.get("FLASK_SECRET_KEY", "change_me"))
-app.config["SESSION_COOKIE_SAMESITE"] = os.getenv("SESSION_COOKIE_SAMESITE", "Lax")
-app.config["SESSION_COOKIE_SECURE"] = os.getenv("SESSION_COOKIE_SECURE", "False") == "True"
-
-# CORS
-allowed = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173").split(",") if o.strip()]
-print(f"CORS allowed origins: {allowed}")
-
-CORS(app, 
-     origins=allowed, 
-     supports_credentials=True, 
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     expose_headers=["Content-Type"])
-
-# Init extensions
-db.init_app(app)
-migrate.init_app(app, db)
-init_oauth(app)  # <-- registers 'google' client with this app
-
-# Blueprints
-app.register_blueprint(scan_bp)
-app.register_blueprint(verification_bp)
-app.register_blueprint(cards_bp)
-app.register_blueprint(shopify_bp)
-app.register_blueprint(admin_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(collection_bp)
-app.register_blueprint(contact_bp)  # Add this line
-
-
-@app.get('/health')
-def health():
-    return {"ok": True}
-
-# Debug CORS preflight requests
-@app.route('/api/auth/me', methods=['OPTIONS'])
-def options_me():
-    from flask import request
-    print(f"🔍 CORS preflight OPTIONS request for /api/auth/me")
-    print(f"  - Origin: {request.headers.get('Origin')}")
-    print(f"  - Access-Control-Request-Method: {request.headers.get('Access-Control-Request-Method')}")
-    print(f"  - Access-Control-Request-Headers: {request.headers.get('Access-Control-Request-Headers')}")
-    return "", 200
+
+def _configure(app: Flask):
+    app.config["SQLALCHEMY_DATABASE_URI"] = _normalize_db_url(os.environ.get("DATABASE_URL"))
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("postgresql"):
+        # Per-worker pool; under gevent this (not the worker count) caps concurrent DB work
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+        }
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", os.environ.get("FLASK_SECRET_KEY", "change_me"))
+    app.config["SESSION_COOKIE_SAMESITE"] = os.getenv("SESSION_COOKIE_SAMESITE", "Lax")
+    app.config["SESSION_COOKIE_SECURE"] = os.getenv("SESSION_COOKIE_SECURE", "False") == "True"
+
+
+def create_app(minimal: bool = False) -> Flask:
+    """
+    Build the Flask app.
+
+    minimal=True gives config + DB + migrations only: no blueprints, OAuth,
+    CORS, caches or background workers, and none of their imports. Scripts in
+    backend/scripts/ and ``flask db`` use it:
+
+        flask --app "app:create_app(minimal=True)" db upgrade
+    """
+    app = Flask(__name__)
+    _configure(app)
+
+    # Init extensions
+    db.init_app(app)
+    migrate.init_app(app, db)
+    # Session hooks that keep athlete versions (and so ETags) moving; scripts edit these rows too
+    import athlete_cache  # noqa: F401
+    if minimal:
+        return app
+
+    # Imported here so minimal apps never pay for the routes and their dependencies
+    from instrumentation import init_instrumentation
+    from athlete_cache import init_athlete_cache
+    from scan_log import init_scan_log
+    from replay_counters import init_replay_counters
+    from mail_queue import init_mail_queue
+    from template_index import init_template_index
+    from shopify_ingest import init_shopify_ingest
+    from routes_scan import bp as scan_bp
+    from routes_verification import bp as verification_bp
+    from routes_cards import bp as cards_bp
+    from routes_shopify import bp as shopify_bp
+    from routes_admin import bp as admin_bp
+    from routes_export import bp as export_bp
+    from routes_collection import bp as collection_bp
+    from routes_auth import bp as auth_bp, init_oauth
+    from routes_contact import bp as contact_bp
+
+    # CORS
+    allowed = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173").split(",") if o.strip()]
+    print(f"CORS allowed origins: {allowed}")
+
+    CORS(app, 
+         origins=allowed, 
+         supports_credentials=True, 
+         allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         expose_headers=["Content-Type"])
+
+    init_instrumentation(app)  # first, so the other before_request hooks are timed too
+    init_oauth(app)  # registers 'google'; discovery metadata is fetched on first use
+    init_athlete_cache(app)
+    init_scan_log(app)
+    init_replay_counters(app)
+    init_mail_queue(app)
+    init_template_index(app)
+    init_shopify_ingest(app)
+
+    # Blueprints
+    app.register_blueprint(scan_bp)
+    app.register_blueprint(verification_bp)
+    app.register_blueprint(cards_bp)
+    app.register_blueprint(shopify_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(collection_bp)
+    app.register_blueprint(contact_bp)
+
+    @app.get('/health')
+    def health():
+        return {"ok": True}
+
+    # Debug CORS preflight requests
+    @app.route('/api/auth/me', methods=['OPTIONS'])
+    def options_me():
+        from flask import request
+        print(f"🔍 CORS preflight OPTIONS request for /api/auth/me")
+        print(f"  - Origin: {request.headers.get('Origin')}")
+        print(f"  - Access-Control-Request-Method: {request.headers.get('Access-Control-Request-Method')}")
+        print(f"  - Access-Control-Request-Headers: {request.headers.get('Access-Control-Request-Headers')}")
+        return "", 200
+
+    return app
+
+
+def __getattr__(name):
+    # ``app:app`` (gunicorn, flask CLI) and ``from app import app`` build the
+    # full app on first access, so importing this module alone stays cheap.
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5001')), debug=True)
+    create_app().run(host='0.0.0.0', port=int(os.getenv('PORT', '5001')), debug=True)
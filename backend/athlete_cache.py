@@ -0,0 +1,206 @@
+# backend/athlete_cache.py
+"""
+Cache of the serialized athlete sub-document used by GET /api/cards/<id>.
+
+Entries are keyed by athlete id and stamped with a version string built from
+Athlete.updated_at, so a row that changed is never served stale. Writes made
+through the ORM (Athlete or any of its child tables) invalidate the entry on
+commit; a TTL bounds staleness for scripts that write with raw SQL.
+
+By default each gunicorn worker keeps its own LRU. Set ATHLETE_CACHE_DIR to
+share entries between the workers of a host through a spool directory - a
+local stand-in for a shared store such as Redis.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from models import Athlete, AthleteAchievement, AthleteEquipment, AthleteStats, AthleteQualification, CardTemplate
+
+_CHILD_MODELS = (AthleteAchievement, AthleteEquipment, AthleteStats, AthleteQualification)
+# Template columns shown on cards and in collections (not counters such as minted_count)
+_TEMPLATE_DISPLAY_COLUMNS = ("version", "image_url", "glb_url")
+
+
+class LocalStore:
+    """Thread-safe, size-bounded LRU living in this worker's memory."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileStore:
+    """Spool directory shared by every worker on the host (one JSON file per key)."""
+
+    def __init__(self, path: str, maxsize: int = 256):
+        self.path = path
+        self.maxsize = maxsize
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        # Write-then-rename so readers in other workers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, self._file(key))
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                self.delete(name[:-5])
+
+    def _evict(self):
+        entries = [e for e in os.scandir(self.path) if e.name.endswith(".json")]
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[:len(entries) - self.maxsize]:
+            self.delete(e.name[:-5])
+
+
+def athlete_version(ath) -> str:
+    """Version stamp for an athlete row; changes whenever the profile is written."""
+    stamp = ath.updated_at or ath.created_at
+    return stamp.isoformat() if stamp else "0"
+
+
+class AthleteCache:
+    def __init__(self, store=None, ttl: int = 300):
+        self.store = store or LocalStore()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, athlete_id, version: str) -> dict | None:
+        entry = self.store.get(str(athlete_id))
+        if (
+            entry is None
+            or entry["v"] != version
+            or (self.ttl and time.time() - entry["t"] > self.ttl)
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["doc"]
+
+    def set(self, athlete_id, version: str, doc: dict):
+        self.store.set(str(athlete_id), {"v": version, "t": time.time(), "doc": doc})
+
+    def invalidate(self, *athlete_ids):
+        for athlete_id in athlete_ids:
+            self.store.delete(str(athlete_id))
+
+    def clear(self):
+        self.store.clear()
+
+
+cache = AthleteCache()
+
+
+def init_athlete_cache(app):
+    """Configure the module-level cache from app config / environment."""
+    maxsize = int(app.config.get("ATHLETE_CACHE_SIZE", os.getenv("ATHLETE_CACHE_SIZE", "256")))
+    cache.ttl = int(app.config.get("ATHLETE_CACHE_TTL", os.getenv("ATHLETE_CACHE_TTL", "300")))
+    spool = app.config.get("ATHLETE_CACHE_DIR", os.getenv("ATHLETE_CACHE_DIR"))
+    cache.store = FileStore(spool, maxsize) if spool else LocalStore(maxsize)
+
+
+# ---------------- invalidation hooks ----------------
+def _child_athlete(session, obj):
+    athlete = obj.__dict__.get("athlete")
+    if athlete is None and obj.athlete_id is not None:
+        athlete = session.get(Athlete, obj.athlete_id)
+    return athlete
+
+
+def _template_art_changed(obj) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in _TEMPLATE_DISPLAY_COLUMNS)
+
+
+@event.listens_for(Session, "before_flush")
+def _touch_parent_athletes(session, flush_context, instances):
+    """
+    Bump Athlete.updated_at when only a child row (or a template's art) changed,
+    so the version moves - and with it the collection ETags built from it.
+    """
+    with session.no_autoflush:
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, CardTemplate):
+                if obj not in session.dirty or not _template_art_changed(obj):
+                    continue
+            elif not isinstance(obj, _CHILD_MODELS):
+                continue
+            athlete = _child_athlete(session, obj)
+            if athlete is not None and athlete not in session.new and athlete not in session.deleted:
+                athlete.updated_at = func.now()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_athletes(session, flush_context):
+    ids = session.info.setdefault("athlete_cache_dirty", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Athlete):
+            ids.add(obj.id)
+        elif isinstance(obj, _CHILD_MODELS) and obj.athlete_id is not None:
+            ids.add(obj.athlete_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    ids = session.info.pop("athlete_cache_dirty", None)
+    if ids:
+        cache.invalidate(*ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("athlete_cache_dirty", None)
@@ -0,0 +1,109 @@
+# backend/auth.py
+"""
+Shared request authentication: who is making this request?
+
+A caller is identified, in order, by
+  1. ``?auth_token=`` (Safari blocks cross-site cookies and the Authorization header)
+  2. ``Authorization: Bearer <auth token>``
+  3. the Flask session's ``uid``
+
+Auth tokens are itsdangerous-signed user ids valid for AUTH_TOKEN_MAX_AGE seconds.
+The serializer is built once per (secret, salt), and verified tokens are
+remembered in a small TTL cache (AUTH_TOKEN_CACHE_TTL, default 60s), so the
+frontend's /api/auth/me call on every navigation skips the HMAC check. The
+cache is keyed by (secret, salt, token), so rotating SECRET_KEY invalidates it
+at once, and a hit still honours the token's own expiry. The resolved id and User row are
+memoized on ``flask.g`` for the rest of the request.
+"""
+import os
+import time
+import uuid
+
+from flask import current_app, g, request, session
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+from models import db, User
+from ttl_cache import TTLCache
+
+AUTH_TOKEN_MAX_AGE = 3600  # 1 hour expiry
+
+_token_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("AUTH_TOKEN_CACHE_TTL", "60")),
+)
+_serializers: dict[tuple, URLSafeTimedSerializer] = {}
+
+
+def _uuid(val) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(str(val))
+    except Exception:
+        return None
+
+
+def _serializer_key() -> tuple:
+    return current_app.secret_key, current_app.config.get("AUTH_TOKEN_SALT", "auth-token")
+
+
+def auth_serializer() -> URLSafeTimedSerializer:
+    key = secret, salt = _serializer_key()
+    s = _serializers.get(key)
+    if s is None:
+        s = _serializers[key] = URLSafeTimedSerializer(secret, salt=salt)
+    return s
+
+
+def generate_auth_token(user_id) -> str:
+    """Generate a secure auth token for URL-based authentication"""
+    return auth_serializer().dumps(str(user_id))
+
+
+def verify_auth_token(token) -> str | None:
+    """User id carried by a valid, unexpired auth token, else None."""
+    if not token:
+        return None
+    cache_key = (*_serializer_key(), token)
+    hit = _token_cache.get(cache_key)
+    if hit is not None:
+        user_id, issued_at = hit
+        if time.time() - issued_at <= AUTH_TOKEN_MAX_AGE:
+            return user_id
+        _token_cache.pop(cache_key)
+        return None
+    try:
+        user_id, issued_at = auth_serializer().loads(token, max_age=AUTH_TOKEN_MAX_AGE, return_timestamp=True)
+    except (BadSignature, SignatureExpired):
+        return None
+    _token_cache.set(cache_key, (user_id, issued_at.timestamp()))
+    return user_id
+
+
+def _candidate_uids():
+    """User ids the request claims, strongest first (see module docstring)."""
+    token = request.args.get("auth_token")
+    if token:
+        yield _uuid(verify_auth_token(token))
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        yield _uuid(verify_auth_token(header[7:]))
+    yield _uuid(session.get("uid"))
+
+
+def current_user_id() -> uuid.UUID | None:
+    """Authenticated user id for this request, without loading the User row."""
+    if "auth_uid" not in g:
+        g.auth_uid = next((uid for uid in _candidate_uids() if uid), None)
+    return g.auth_uid
+
+
+def current_user() -> User | None:
+    """Authenticated User for this request (loaded at most once per request)."""
+    if "auth_user" not in g:
+        user = None
+        for uid in _candidate_uids():
+            user = db.session.get(User, uid) if uid else None
+            if user:
+                break
+        g.auth_user = user
+        g.auth_uid = user.id if user else None
+    return g.auth_user
@@ -0,0 +1,80 @@
+# backend/background.py
+"""
+Per-worker background loops (write-behind buffers, outbound queues).
+
+Threads started in the gunicorn master (``--preload``) do not survive the
+fork, so a worker starts lazily on first use in each process. It drains once
+more on shutdown: ``stop_all()`` from gunicorn's worker_exit/worker_abort
+hooks (gunicorn.conf.py), with atexit as the fallback for other servers.
+A SIGKILLed worker cannot drain.
+"""
+import atexit
+import os
+import threading
+from abc import ABC, abstractmethod
+
+_started: list = []
+
+
+class BackgroundWorker(ABC):
+    """Daemon thread calling ``tick()`` every ``interval`` seconds, or sooner when woken."""
+
+    def __init__(self, name: str, interval: float = 1.0):
+        self.name = name
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @abstractmethod
+    def tick(self):
+        """One pass of the loop's work; called from the worker thread and once more at stop()."""
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            if self not in _started:
+                _started.append(self)
+                atexit.register(self.stop)
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the loop and run one last tick so nothing buffered is lost."""
+        if self._pid != os.getpid() or self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.tick()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.tick()
+            except Exception as e:  # keep the loop alive; tick() reports its own failures
+                print(f"❌ {self.name} tick failed: {e}")
+
+
+def stop_all(timeout: float = 5.0):
+    """Stop and drain every loop started in this process."""
+    for worker in list(_started):
+        try:
+            worker.stop(timeout)
+        except Exception as e:
+            print(f"❌ {worker.name} drain failed: {e}")
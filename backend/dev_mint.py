@@ -29,12 +29,14 @@ from datetime import datetime, timezone
 import random
 import string
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import (
     User, Athlete, CardTemplate, CardInstance, ScanEvent,
     CardStatus
 )
 from sqlalchemy import select
+from minting import mint_instance, EditionCapReached
 from sqlalchemy.orm import joinedload
 
 
@@ -123,39 +125,30 @@ def main():
         print(f"Minting count:   {args.count}")
 
         created = []
+        db.session.rollback()  # end the implicit tx from the lookups above
         for _ in range(args.count):
             with db.session.begin():
-                # Lock template row to avoid race in minted_count
-                t_locked = db.session.execute(
-                    select(CardTemplate).where(CardTemplate.id == template.id).with_for_update()
-                ).scalar_one()
-
-                # Respect edition cap if present
-                next_serial = (t_locked.minted_count or 0) + 1
-                if t_locked.edition_cap is not None and next_serial > t_locked.edition_cap:
-                    raise SystemExit(
-                        f"ABORT: edition_cap reached for template {t_locked.id} "
-                        f"(cap={t_locked.edition_cap}, current minted={t_locked.minted_count})."
-                    )
-
-                t_locked.minted_count = next_serial
-
                 tag_id, uid = rand_tag(prefix=args.tag_prefix)
 
-                inst = CardInstance(
-                    template_id=t_locked.id,
-                    serial_no=next_serial,
-                    etrnl_tag_uid=uid,
-                    etrnl_tag_id=tag_id,
-                    last_ctr=1,  # pretend first scan already happened
-                    owner_user_id=user.id if user else None,
-                    status=CardStatus.claimed if user else CardStatus.unassigned,
-                )
-                db.session.add(inst)
+                # Allocates the next serial (respecting edition_cap) and inserts in one statement
+                try:
+                    inst_id, _serial = mint_instance(
+                        template.id,
+                        tag_uid=uid,
+                        tag_id=tag_id,
+                        last_ctr=1,  # pretend first scan already happened
+                        owner_user_id=user.id if user else None,
+                        status=CardStatus.claimed if user else CardStatus.unassigned,
+                    )
+                except EditionCapReached:
+                    raise SystemExit(
+                        f"ABORT: edition_cap reached for template {template.id} "
+                        f"(cap={template.edition_cap})."
+                    )
 
                 # Add a "successful scan" event for the audit trail
                 db.session.add(ScanEvent(
-                    card_instance_id=inst.id,
+                    card_instance_id=inst_id,
                     tag_id=tag_id,
                     uid=uid,
                     ctr=1,
@@ -167,9 +160,9 @@ def main():
                     created_at=datetime.now(timezone.utc)
                 ))
 
-                created.append(inst)
+                created.append(inst_id)
 
-        db.session.commit()
+        created = [db.session.get(CardInstance, inst_id) for inst_id in created]
 
         print("\nCreated instances:")
         for inst in created:
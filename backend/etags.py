@@ -0,0 +1,31 @@
+# backend/etags.py
+"""
+Strong ETags and If-None-Match handling for JSON endpoints.
+
+Handlers compute the tag from row versions they already have (ids, status,
+updated_at, ...) *before* serializing, and return ``not_modified(tag)`` when
+the client's copy is current, so a repeat view skips serialization entirely.
+"""
+import hashlib
+
+from flask import request, make_response
+
+
+def make_etag(*parts) -> str:
+    """Hash the given row-version parts into an opaque strong ETag value."""
+    raw = "|".join("" if p is None else str(getattr(p, "value", p)) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified(etag: str):
+    """Return a 304 response if the request's If-None-Match matches, else None."""
+    if etag in request.if_none_match:
+        return with_etag(make_response("", 304), etag)
+    return None
+
+
+def with_etag(response, etag: str):
+    response.set_etag(etag)
+    # Per-user payloads: browsers may keep them but must revalidate each time
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,58 @@
+# backend/gunicorn.conf.py
+"""
+Gunicorn settings (``gunicorn -c gunicorn.conf.py app:app``).
+
+GUNICORN_WORKER_CLASS=gevent (the default) runs each worker as a gevent hub.
+A scan waiting on ETRNL / Titan NFC then parks a greenlet instead of blocking
+a whole worker, and each worker keeps up to GUNICORN_WORKER_CONNECTIONS
+requests in flight. Set GUNICORN_WORKER_CLASS=sync to go back to one request
+per worker.
+
+With --preload the app is imported in the master before gunicorn's gevent
+worker would monkey-patch, so we patch here, before anything else is
+imported. psycopg2 is a C extension that gevent cannot patch, so psycogreen
+makes its socket waits yield to the hub. DB concurrency is then bounded by
+the SQLAlchemy pool (DB_POOL_SIZE + DB_MAX_OVERFLOW per worker), not by the
+number of workers.
+
+worker_exit / worker_abort drain the per-worker background loops (scan log,
+replay counters, mail, Shopify ingest) before the process goes away; atexit
+alone does not run reliably when gunicorn stops or times out a worker.
+"""
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 20
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+if worker_class == "gevent":
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
+
+
+def _drain_background(worker):
+    from background import stop_all
+
+    worker.log.info("draining background buffers")
+    stop_all()
+
+
+def worker_exit(server, worker):
+    _drain_background(worker)
+
+
+def worker_abort(worker):
+    # SIGABRT: gunicorn's worker timeout
+    _drain_background(worker)
@@ -0,0 +1,248 @@
+# backend/instrumentation.py
+"""
+Per-request performance accounting.
+
+With METRICS_ENABLED=1, every request records:
+  - wall time (a histogram per endpoint)
+  - SQL statement count and SQL time, from engine cursor events
+  - upstream HTTP time, from upstream.UpstreamClient
+  - response bytes, when the length is known (streamed exports report 0)
+
+Figures are aggregated per (endpoint, method, status). They are served in
+Prometheus text format at GET /metrics, which requires
+``Authorization: Bearer $METRICS_TOKEN`` when that variable is set. Each
+response also gets a Server-Timing header (``app``, ``db``, ``upstream``)
+that browser devtools show, unless SERVER_TIMING=0.
+
+Metrics are per process: each gunicorn worker serves its own counters, so
+scrape every worker or aggregate accordingly.
+
+When disabled, no hooks are registered at all, so requests pay nothing.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, abort, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import upstream
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ("started", "sql_count", "sql_time", "upstream_time", "status", "size")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.upstream_time = 0.0
+        self.status = 500
+        self.size = 0
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+
+class EndpointStats:
+    __slots__ = ("requests", "duration_sum", "duration_buckets", "sql_statements", "sql_seconds",
+                 "upstream_seconds", "response_bytes")
+
+    def __init__(self):
+        self.requests = 0
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.upstream_seconds = 0.0
+        self.response_bytes = 0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str, str], EndpointStats] = {}
+
+    def observe(self, endpoint: str, method: str, m: RequestMetrics, duration: float):
+        key = (endpoint, method, str(m.status))
+        with self._lock:
+            s = self._stats.get(key)
+            if s is None:
+                s = self._stats[key] = EndpointStats()
+            s.requests += 1
+            s.duration_sum += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    s.duration_buckets[i] += 1
+                    break
+            else:
+                s.duration_buckets[-1] += 1
+            s.sql_statements += m.sql_count
+            s.sql_seconds += m.sql_time
+            s.upstream_seconds += m.upstream_time
+            s.response_bytes += m.size
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted((k, _copy(s)) for k, s in self._stats.items())
+        out = []
+
+        def family(name, kind, help_):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def labels(key, **extra):
+            pairs = dict(zip(("endpoint", "method", "status"), key), **extra)
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs.items()) + "}"
+
+        family("http_request_duration_seconds", "histogram", "Wall time per request.")
+        for key, s in items:
+            cumulative = 0
+            for bound, n in zip(DURATION_BUCKETS, s.duration_buckets):
+                cumulative += n
+                out.append(f"http_request_duration_seconds_bucket{labels(key, le=str(bound))} {cumulative}")
+            out.append(f"http_request_duration_seconds_bucket{labels(key, le='+Inf')} {s.requests}")
+            out.append(f"http_request_duration_seconds_sum{labels(key)} {s.duration_sum:.6f}")
+            out.append(f"http_request_duration_seconds_count{labels(key)} {s.requests}")
+        for name, attr, help_ in (
+            ("http_request_sql_statements_total", "sql_statements", "SQL statements executed while serving requests."),
+            ("http_request_sql_seconds_total", "sql_seconds", "Time spent in SQL cursor execution."),
+            ("http_request_upstream_seconds_total", "upstream_seconds", "Time spent waiting on verification upstreams."),
+            ("http_response_bytes_total", "response_bytes", "Response body bytes (when the length is known)."),
+        ):
+            family(name, "counter", help_)
+            for key, s in items:
+                value = getattr(s, attr)
+                out.append(f"{name}{labels(key)} {value:.6f}" if isinstance(value, float) else f"{name}{labels(key)} {value}")
+
+        family("upstream_requests_total", "counter", "Upstream HTTP attempts, by upstream and outcome.")
+        for name, st in sorted(upstream.all_stats().items()):
+            out.append(f'upstream_requests_total{{upstream="{name}",outcome="ok"}} {st["requests"] - st["errors"]}')
+            out.append(f'upstream_requests_total{{upstream="{name}",outcome="error"}} {st["errors"]}')
+
+        # Imported here: the backends pull in sun.py's crypto, which /metrics alone shouldn't cost at startup
+        from verification_backends import LATENCY_BUCKETS, registry as backends
+        backend_stats = sorted(backends.stats().items())
+        for name, prefix, help_ in (
+            ("scan_verify_duration_seconds", "verify", "Tag verification time, by backend."),
+            ("scan_duration_seconds", "scan", "Whole scan pipeline time (verify, lookup, mint/log), by backend."),
+        ):
+            family(name, "histogram", help_)
+            for backend, st in backend_stats:
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, st[f"{prefix}_buckets"]):
+                    cumulative += n
+                    out.append(f'{name}_bucket{{backend="{backend}",le="{bound}"}} {cumulative}')
+                out.append(f'{name}_bucket{{backend="{backend}",le="+Inf"}} {st[f"{prefix}_count"]}')
+                out.append(f'{name}_sum{{backend="{backend}"}} {st[f"{prefix}_sum"]:.6f}')
+                out.append(f'{name}_count{{backend="{backend}"}} {st[f"{prefix}_count"]}')
+        family("scan_verify_errors_total", "counter", "Verification attempts that failed upstream, by backend.")
+        for backend, st in backend_stats:
+            out.append(f'scan_verify_errors_total{{backend="{backend}"}} {st["verify_errors"]}')
+        family("scans_total", "counter", "Scans by backend and outcome (minted, rescan, or the failure reason).")
+        for backend, st in backend_stats:
+            for outcome, n in sorted(st["outcomes"].items()):
+                out.append(f'scans_total{{backend="{backend}",outcome="{_escape(outcome)}"}} {n}')
+        return "\n".join(out) + "\n"
+
+
+def _copy(s: EndpointStats) -> EndpointStats:
+    c = EndpointStats()
+    for attr in EndpointStats.__slots__:
+        v = getattr(s, attr)
+        setattr(c, attr, list(v) if isinstance(v, list) else v)
+    return c
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+# ---------------- SQL / upstream accounting ----------------
+# The start time rides on the statement's execution context, not the pooled
+# connection: after_cursor_execute never fires for a statement that raises
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    m = _current.get()
+    if m is None:
+        return
+    started = getattr(context, "_query_started", None)
+    if started is not None:
+        m.sql_time += time.perf_counter() - started
+    m.sql_count += 1
+
+
+def _on_upstream(name: str, elapsed: float, ok: bool):
+    m = _current.get()
+    if m is not None:
+        m.upstream_time += elapsed
+
+
+# ---------------- Flask hooks ----------------
+def _start():
+    request.environ["instrumentation.token"] = _current.set(RequestMetrics())
+
+
+def _server_timing(response):
+    m = _current.get()
+    if m is None:
+        return response
+    m.status = response.status_code
+    m.size = response.content_length or 0
+    if _server_timing_enabled:
+        app_ms = (time.perf_counter() - m.started) * 1000
+        response.headers["Server-Timing"] = (
+            f"app;dur={app_ms:.1f}, db;dur={m.sql_time * 1000:.1f};desc=\"{m.sql_count} queries\", "
+            f"upstream;dur={m.upstream_time * 1000:.1f}"
+        )
+    return response
+
+
+def _finish(exc):
+    m = _current.get()
+    token = request.environ.pop("instrumentation.token", None)
+    if m is None or token is None:
+        return
+    _current.reset(token)
+    if request.endpoint == "metrics":
+        return
+    registry.observe(request.endpoint or "<unmatched>", request.method, m, time.perf_counter() - m.started)
+
+
+def metrics():
+    if _metrics_token and request.headers.get("Authorization") != f"Bearer {_metrics_token}":
+        abort(401)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+_server_timing_enabled = True
+_metrics_token = ""
+
+
+def init_instrumentation(app):
+    """Register the hooks and /metrics. Call before other before_request hooks so their time counts."""
+    global _server_timing_enabled, _metrics_token
+    if os.getenv("METRICS_ENABLED", "0") != "1":
+        return
+    _server_timing_enabled = os.getenv("SERVER_TIMING", "1") == "1"
+    _metrics_token = os.getenv("METRICS_TOKEN", "")
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    upstream.add_observer(_on_upstream)
+    app.before_request(_start)
+    app.after_request(_server_timing)
+    app.teardown_request(_finish)
+    app.add_url_rule("/metrics", "metrics", metrics)
+    print("📈 Request metrics enabled at /metrics")
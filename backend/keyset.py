@@ -0,0 +1,36 @@
+# backend/keyset.py
+"""
+Opaque keyset-pagination cursors over (created_at, id).
+
+A cursor is the URL-safe base64 of the last row's created_at and id; the next
+page filters with a row-value comparison, ``(created_at, id) > cursor`` (or
+``<`` when walking newest-first), so each page is an index seek rather than an
+OFFSET scan.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = json.dumps([created_at.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception:
+        return None
+
+
+def after(created_col, id_col, position, descending: bool = False):
+    """WHERE clause selecting the rows that come after ``position`` in (created_at, id) order."""
+    key = tuple_(created_col, id_col)
+    return key < tuple_(*position) if descending else key > tuple_(*position)
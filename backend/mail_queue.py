@@ -0,0 +1,166 @@
+# backend/mail_queue.py
+"""
+Outbound mail queue: request handlers enqueue, a background sender delivers.
+
+``enqueue_email(...)`` stores an OutboundEmail row and returns. Each gunicorn
+worker runs a MailSender thread that claims due rows with
+``FOR UPDATE SKIP LOCKED`` (so two workers never pick the same mail) and
+delivers them through mailer.send_email, which keeps its SMTP connection and
+SendGrid HTTP session open between messages. Failures are retried with
+exponential backoff up to MAIL_MAX_ATTEMPTS, then marked ``failed``.
+
+A claimed row is leased for MAIL_LEASE seconds: if the worker dies mid-send
+the row becomes due again and another sender picks it up.
+
+MAIL_QUEUE_MODE=sync keeps the old behaviour and sends inside the request.
+"""
+import os
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from background import BackgroundWorker
+from mailer import send_email
+from models import db, OutboundEmail
+
+_QUEUED_KEY = "mail_queued"
+
+
+class MailSender(BackgroundWorker):
+    def __init__(self, batch_size: int = 20, interval: float = 5.0, max_attempts: int = 8,
+                 retry_base: float = 30.0, retry_max: float = 3600.0, lease: float = 300.0):
+        super().__init__("mail-sender", interval)
+        self.app = None
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "errors": 0, "last_error": None}
+
+    def _count(self, key: str, error: str | None = None):
+        with self._lock:
+            self.stats[key] += 1
+            if error:
+                self.stats["last_error"] = error
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _claim(self) -> list[tuple]:
+        now = datetime.now(timezone.utc)
+        rows = db.session.execute(
+            select(OutboundEmail)
+            .where(OutboundEmail.status.in_(("pending", "sending")), OutboundEmail.next_attempt_at <= now)
+            .order_by(OutboundEmail.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        claimed = []
+        for m in rows:
+            m.status = "sending"
+            m.attempts += 1
+            m.next_attempt_at = now + timedelta(seconds=self.lease)
+            claimed.append((m.id, m.to_addr, m.subject, m.html, m.text, m.attempts))
+        db.session.commit()
+        return claimed
+
+    def _finish(self, mail_id, attempts: int, error: str | None = None):
+        now = datetime.now(timezone.utc)
+        if error is None:
+            values = {"status": "sent", "sent_at": now, "last_error": None}
+            self._count("sent")
+        elif attempts >= self.max_attempts:
+            values = {"status": "failed", "last_error": error}
+            self._count("failed", error)
+        else:
+            values = {"status": "pending", "last_error": error,
+                      "next_attempt_at": now + timedelta(seconds=self.backoff(attempts))}
+            self._count("retried", error)
+        db.session.execute(update(OutboundEmail).where(OutboundEmail.id == mail_id).values(**values))
+        db.session.commit()
+
+    def tick(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            while True:
+                try:
+                    batch = self._claim()
+                except Exception as e:
+                    db.session.rollback()
+                    self._count("errors", str(e))
+                    print(f"❌ Mail queue claim failed: {e}")
+                    return
+                for mail_id, to, subject, html, text, attempts in batch:
+                    try:
+                        send_email(to, subject, html, text)
+                    except Exception as e:
+                        print(f"❌ Email to {to} failed (attempt {attempts}): {e}")
+                        self._finish(mail_id, attempts, error=f"{type(e).__name__}: {e}")
+                    else:
+                        self._finish(mail_id, attempts)
+                if len(batch) < self.batch_size:
+                    return
+
+
+sender = MailSender()
+_mode = os.getenv("MAIL_QUEUE_MODE", "queue")
+
+
+def init_mail_queue(app):
+    global _mode
+    _mode = app.config.get("MAIL_QUEUE_MODE", os.getenv("MAIL_QUEUE_MODE", "queue"))
+    sender.app = app
+    sender.batch_size = int(os.getenv("MAIL_BATCH", str(sender.batch_size)))
+    sender.interval = float(os.getenv("MAIL_INTERVAL", str(sender.interval)))
+    sender.max_attempts = int(os.getenv("MAIL_MAX_ATTEMPTS", str(sender.max_attempts)))
+    sender.retry_base = float(os.getenv("MAIL_RETRY_BASE", str(sender.retry_base)))
+    sender.lease = float(os.getenv("MAIL_LEASE", str(sender.lease)))
+
+    if _mode != "sync":
+        # Started per worker after the fork; also picks up retries left by earlier processes
+        app.before_request(sender.ensure_started)
+
+
+def enqueue_email(to: str, subject: str, html: str, text: str | None = None, commit: bool = True):
+    """Queue an email for the background sender (same arguments as mailer.send_email)."""
+    if _mode == "sync" or sender.app is None:
+        return send_email(to, subject, html, text)
+    db.session.add(OutboundEmail(to_addr=to, subject=subject, html=html, text=text))
+    db.session.info[_QUEUED_KEY] = True
+    if commit:
+        db.session.commit()
+    return True
+
+
+def queue_stats() -> dict:
+    """Sender counters for this worker plus queue depth by status (all workers)."""
+    by_status = dict(db.session.execute(
+        select(OutboundEmail.status, func.count()).group_by(OutboundEmail.status)
+    ).all())
+    oldest = db.session.execute(
+        select(func.min(OutboundEmail.created_at)).where(OutboundEmail.status.in_(("pending", "sending")))
+    ).scalar()
+    with sender._lock:
+        out = dict(sender.stats)
+    out["queue"] = by_status
+    out["oldest_pending_at"] = oldest.isoformat() if oldest else None
+    return out
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_sender(session):
+    if session.info.pop(_QUEUED_KEY, None):
+        sender.ensure_started()
+        sender.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_QUEUED_KEY, None)
@@ -1,10 +1,79 @@
-import os, smtplib, ssl, json, requests
+import os, smtplib, ssl, json, threading, time, requests
 from email.message import EmailMessage
+from requests.adapters import HTTPAdapter
 
 MAIL_BACKEND = os.getenv('MAIL_BACKEND', 'console')
 SENDER = os.getenv('EMAIL_SENDER', 'no-reply@example.com')
+SENDGRID_URL = 'https://api.sendgrid.com/v3/mail/send'
+# Close a cached SMTP connection that has been idle this long (servers drop them anyway)
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '60'))
+
+# Keep-alive session for SendGrid, shared by every send in this process
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+
+class _SMTPConnection:
+    """One logged-in SMTP connection, reused across messages and reopened when dropped."""
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        host = os.getenv('SMTP_HOST'); port = int(os.getenv('SMTP_PORT', '587'))
+        user = os.getenv('SMTP_USER'); pwd = os.getenv('SMTP_PASS')
+        use_tls = os.getenv('SMTP_USE_TLS', 'True') == 'True'
+        s = smtplib.SMTP(host, port, timeout=30)
+        if use_tls:
+            s.starttls(context=ssl.create_default_context())
+        if user: s.login(user, pwd)
+        return s
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def send(self, msg: EmailMessage):
+        with self._lock:
+            if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+                self._close()
+            for attempt in (1, 2):
+                if self._smtp is None:
+                    self._smtp = self._open()
+                try:
+                    self._smtp.send_message(msg)
+                    break
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Stale pooled connection: reconnect once, then give up
+                    self._close()
+                    if attempt == 2:
+                        raise
+                except smtplib.SMTPException:
+                    # Refused by the server (recipient, sender, data): resending here could
+                    # duplicate it; the connection is still good and mail_queue backs off
+                    raise
+                except OSError:
+                    # Timed out mid-conversation: the session state is unknown, don't reuse it
+                    self._close()
+                    raise
+            self._last_used = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+smtp_connection = _SMTPConnection()
+
 
 def send_email(to: str, subject: str, html: str, text: str | None = None):
+    """Deliver one email now (blocking). Request handlers should use mail_queue.enqueue_email."""
     text = text or "Please view this email in an HTML-capable client."
     if MAIL_BACKEND == 'console':
         print("\n=== EMAIL (console) ===")
@@ -17,8 +86,8 @@ def send_email(to: str, subject: str, html: str, text: str | None = None):
     if MAIL_BACKEND == 'sendgrid':
         api_key = os.getenv('SENDGRID_API_KEY')
         if not api_key: raise RuntimeError("SENDGRID_API_KEY missing")
-        resp = requests.post(
-            'https://api.sendgrid.com/v3/mail/send',
+        resp = _http.post(
+            SENDGRID_URL,
             headers={'Authorization': f'Bearer {api_key}',
                      'Content-Type': 'application/json'},
             data=json.dumps({
@@ -37,32 +106,21 @@ def send_email(to: str, subject: str, html: str, text: str | None = None):
                         "enable": False
                     }
                 }
-            })
+            }),
+            timeout=(3.05, 15),
         )
         if resp.status_code >= 300:
             raise RuntimeError(f"SendGrid error: {resp.status_code} {resp.text}")
         return True
 
     if MAIL_BACKEND == 'smtp':
-        host = os.getenv('SMTP_HOST'); port = int(os.getenv('SMTP_PORT', '587'))
-        user = os.getenv('SMTP_USER'); pwd = os.getenv('SMTP_PASS')
-        use_tls = os.getenv('SMTP_USE_TLS', 'True') == 'True'
         msg = EmailMessage()
         msg['From'] = SENDER
         msg['To'] = to
         msg['Subject'] = subject
         msg.set_content(text)
         msg.add_alternative(html, subtype='html')
-        if use_tls:
-            ctx = ssl.create_default_context()
-            with smtplib.SMTP(host, port) as s:
-                s.starttls(context=ctx)
-                if user: s.login(user, pwd)
-                s.send_message(msg)
-        else:
-            with smtplib.SMTP(host, port) as s:
-                if user: s.login(user, pwd)
-                s.send_message(msg)
+        smtp_connection.send(msg)
         return True
 
     raise RuntimeError(f"Unknown MAIL_BACKEND: {MAIL_BACKEND}")
@@ -0,0 +1,127 @@
+"""partition scans by month, add scan_daily_rollups
+
+Revision ID: c3d9e1f2a7b4
+Revises: b15c7b11405c
+Create Date: 2025-10-24 10:42:11.204518
+
+Rebuilds ``scans`` as a table range-partitioned on created_at (one partition
+per calendar month plus a DEFAULT catch-all), copies the existing rows over and
+indexes card_instance_id/created_at. Postgres requires the partition key in the
+primary key, so the PK becomes (id, created_at).
+
+Future partitions, retention and the rollup refresh are handled by
+scripts/maintain_scan_partitions.py.
+
+Recovery: if that job misses a month, the month's scans land in
+scans_default, and ``CREATE TABLE ... PARTITION OF scans`` for that month then
+fails while those rows are there. The job moves them out itself on its next
+run (it also reports rows left in scans_default). By hand, in one transaction:
+
+  ALTER TABLE scans DETACH PARTITION scans_default;
+  CREATE TABLE scans_YYYY_MM PARTITION OF scans FOR VALUES FROM ('YYYY-MM-01') TO ('<next month>-01');
+  INSERT INTO scans SELECT * FROM scans_default WHERE created_at >= 'YYYY-MM-01' AND created_at < '<next month>-01';
+  DELETE FROM scans_default WHERE created_at >= 'YYYY-MM-01' AND created_at < '<next month>-01';
+  ALTER TABLE scans ATTACH PARTITION scans_default DEFAULT;
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9e1f2a7b4'
+down_revision = 'b15c7b11405c'
+branch_labels = None
+depends_on = None
+
+# Months to pre-create past the current one; the maintenance job keeps this topped up
+MONTHS_AHEAD = 3
+
+
+def upgrade():
+    op.execute("ALTER TABLE scans RENAME TO scans_legacy")
+    op.execute("ALTER TABLE scans_legacy RENAME CONSTRAINT scans_pkey TO scans_legacy_pkey")
+
+    op.execute("""
+    CREATE TABLE scans (
+      id uuid NOT NULL,
+      card_instance_id uuid REFERENCES card_instances(id),
+      tag_id varchar,
+      uid varchar,
+      ctr integer,
+      authentic boolean,
+      tt_curr varchar,
+      tt_perm varchar,
+      ip varchar,
+      user_agent varchar,
+      created_at timestamptz NOT NULL DEFAULT now(),
+      CONSTRAINT scans_pkey PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE TABLE scans_default PARTITION OF scans DEFAULT")
+
+    # One partition per month from the oldest scan through MONTHS_AHEAD from now
+    op.execute(f"""
+    DO $$
+    DECLARE
+      m date := date_trunc('month', coalesce((SELECT min(created_at) FROM scans_legacy), now()))::date;
+      last date := (date_trunc('month', now()) + interval '{MONTHS_AHEAD} months')::date;
+    BEGIN
+      WHILE m <= last LOOP
+        EXECUTE format(
+          'CREATE TABLE IF NOT EXISTS %I PARTITION OF scans FOR VALUES FROM (%L) TO (%L)',
+          'scans_' || to_char(m, 'YYYY_MM'), m, (m + interval '1 month')::date
+        );
+        m := (m + interval '1 month')::date;
+      END LOOP;
+    END $$;
+    """)
+
+    op.execute("""
+    INSERT INTO scans (id, card_instance_id, tag_id, uid, ctr, authentic, tt_curr, tt_perm, ip, user_agent, created_at)
+    SELECT id, card_instance_id, tag_id, uid, ctr, authentic, tt_curr, tt_perm, ip, user_agent, coalesce(created_at, now())
+    FROM scans_legacy
+    """)
+    op.execute("DROP TABLE scans_legacy")
+
+    op.create_index('ix_scans_card_instance_id_created_at', 'scans', ['card_instance_id', 'created_at'], unique=False)
+    op.create_index('ix_scans_created_at', 'scans', ['created_at'], unique=False)
+
+    op.create_table('scan_daily_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('card_instance_id', sa.UUID(), nullable=False),
+    sa.Column('template_id', sa.UUID(), nullable=False),
+    sa.Column('scans', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('authentic_scans', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('first_scan_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_scan_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['card_instance_id'], ['card_instances.id'], ),
+    sa.ForeignKeyConstraint(['template_id'], ['card_templates.id'], ),
+    sa.PrimaryKeyConstraint('day', 'card_instance_id')
+    )
+    op.create_index('ix_scan_daily_rollups_template_id_day', 'scan_daily_rollups', ['template_id', 'day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_scan_daily_rollups_template_id_day', table_name='scan_daily_rollups')
+    op.drop_table('scan_daily_rollups')
+
+    op.execute("ALTER TABLE scans RENAME TO scans_partitioned")
+    op.execute("ALTER TABLE scans_partitioned RENAME CONSTRAINT scans_pkey TO scans_partitioned_pkey")
+    op.create_table('scans',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('card_instance_id', sa.UUID(), nullable=True),
+    sa.Column('tag_id', sa.String(), nullable=True),
+    sa.Column('uid', sa.String(), nullable=True),
+    sa.Column('ctr', sa.Integer(), nullable=True),
+    sa.Column('authentic', sa.Boolean(), nullable=True),
+    sa.Column('tt_curr', sa.String(), nullable=True),
+    sa.Column('tt_perm', sa.String(), nullable=True),
+    sa.Column('ip', sa.String(), nullable=True),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['card_instance_id'], ['card_instances.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO scans SELECT * FROM scans_partitioned")
+    # Drops every monthly partition along with the parent
+    op.execute("DROP TABLE scans_partitioned CASCADE")
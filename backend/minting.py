@@ -0,0 +1,85 @@
+# backend/minting.py
+"""
+Serial allocation and minting of CardInstance rows.
+
+Serials come from CardTemplate.minted_count, bumped with a single atomic
+``UPDATE ... RETURNING`` that also enforces edition_cap. There is no
+SELECT ... FOR UPDATE and no ORM read-modify-write. On Postgres the bump and
+the instance INSERT are a single statement (a data-modifying CTE).
+
+Serials must stay gap-free and unique per template, so the counter row stays
+locked from that statement until the caller commits. Callers should commit
+right after minting.
+"""
+import uuid
+
+from sqlalchemy import cast, func, insert, literal, or_, select, update
+
+from models import db, CardTemplate, CardInstance, CardStatus
+
+_templates = CardTemplate.__table__
+_instances = CardInstance.__table__
+
+
+class EditionCapReached(Exception):
+    """The template has no serials left under its edition_cap."""
+
+    def __init__(self, template_id):
+        super().__init__(f"edition_cap reached for template {template_id}")
+        self.template_id = template_id
+
+
+def _bump(template_id, count: int):
+    minted = func.coalesce(_templates.c.minted_count, 0)
+    return (
+        update(_templates)
+        .where(
+            _templates.c.id == template_id,
+            or_(_templates.c.edition_cap.is_(None), minted + count <= _templates.c.edition_cap),
+        )
+        .values(minted_count=minted + count)
+        .returning(_templates.c.minted_count)
+    )
+
+
+def allocate_serials(template_id, count: int = 1) -> range:
+    """Reserve ``count`` consecutive serials for a template in one statement."""
+    last = db.session.execute(_bump(template_id, count)).scalar_one_or_none()
+    if last is None:
+        raise EditionCapReached(template_id)
+    return range(last - count + 1, last + 1)
+
+
+def mint_instance(template_id, *, tag_uid, tag_id, last_ctr: int = 0,
+                  owner_user_id=None, status: CardStatus = CardStatus.unassigned):
+    """Allocate the next serial and insert the CardInstance; returns (instance_id, serial_no)."""
+    inst_id = uuid.uuid4()
+    values = {
+        'id': inst_id,
+        'template_id': template_id,
+        'etrnl_tag_uid': tag_uid,
+        'etrnl_tag_id': tag_id,
+        'last_ctr': last_ctr,
+        'owner_user_id': owner_user_id,
+        'status': status,
+    }
+
+    if db.session.get_bind().dialect.name != 'postgresql':
+        values['serial_no'] = allocate_serials(template_id)[0]
+        db.session.execute(insert(_instances).values(**values))
+        return inst_id, values['serial_no']
+
+    # WITH s AS (UPDATE card_templates ... RETURNING minted_count)
+    # INSERT INTO card_instances (...) SELECT ..., s.minted_count FROM s RETURNING serial_no
+    bump = _bump(template_id, 1).cte('serial')
+    cols = list(values)
+    stmt = insert(_instances).from_select(
+        cols + ['serial_no'],
+        # explicit casts: Postgres types bare SELECT-list params as text (breaks the enum)
+        select(*[cast(literal(values[c], _instances.c[c].type), _instances.c[c].type) for c in cols],
+               bump.c.minted_count),
+    ).returning(_instances.c.serial_no)
+    serial = db.session.execute(stmt).scalar_one_or_none()
+    if serial is None:
+        raise EditionCapReached(template_id)
+    return inst_id, serial
@@ -2,7 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM
 from sqlalchemy import func, Enum, CheckConstraint
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 from datetime import date
 import uuid, enum
 
@@ -52,12 +52,13 @@ class User(db.Model):
 
     # helpers
     def set_password(self, raw: str):
-        self.password_hash = generate_password_hash(
-            raw, method='pbkdf2:sha256', salt_length=16
-        )
+        self.password_hash = hasher.hash(raw)
 
     def check_password(self, raw: str) -> bool:
-        return bool(self.password_hash) and check_password_hash(self.password_hash, raw)
+        return hasher.verify(self.password_hash, raw)
+
+    def password_needs_rehash(self) -> bool:
+        return hasher.needs_rehash(self.password_hash)
 
 
 class Athlete(db.Model):
@@ -235,6 +236,14 @@ class CardInstance(db.Model):
     owner = db.relationship('User', backref='card_instances', foreign_keys=[owner_user_id])
 
 
+# Keyset pagination of a user's collection (routes_collection); INCLUDE makes it covering
+db.Index(
+    'ix_card_instances_owner_created_id',
+    CardInstance.owner_user_id, CardInstance.created_at.desc(), CardInstance.id.desc(),
+    postgresql_include=['template_id', 'serial_no', 'status'],
+)
+
+
 class ScanEvent(db.Model):
     __tablename__ = 'scans'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -247,4 +256,89 @@ class ScanEvent(db.Model):
     tt_perm = db.Column(db.String)
     ip = db.Column(db.String)
     user_agent = db.Column(db.String)
+    # Partition key (monthly RANGE partitions), so it is part of the primary key
+    created_at = db.Column(db.DateTime(timezone=True), primary_key=True, server_default=func.now())
+    __table_args__ = (
+        db.Index('ix_scans_card_instance_id_created_at', 'card_instance_id', 'created_at'),
+        db.Index('ix_scans_created_at', 'created_at'),
+    )
+
+
+class ScanDailyRollup(db.Model):
+    """Per-card scan counts per UTC day, refreshed by scripts/maintain_scan_partitions.py."""
+    __tablename__ = 'scan_daily_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    card_instance_id = db.Column(UUID(as_uuid=True), db.ForeignKey('card_instances.id'), primary_key=True)
+    template_id = db.Column(UUID(as_uuid=True), db.ForeignKey('card_templates.id'), nullable=False)
+    scans = db.Column(db.Integer, nullable=False, default=0)
+    authentic_scans = db.Column(db.Integer, nullable=False, default=0)
+    first_scan_at = db.Column(db.DateTime(timezone=True))
+    last_scan_at = db.Column(db.DateTime(timezone=True))
+    __table_args__ = (db.Index('ix_scan_daily_rollups_template_id_day', 'template_id', 'day'),)
+
+
+class OutboundEmail(db.Model):
+    """Mail waiting for (or done with) the background sender in mail_queue.py."""
+    __tablename__ = 'outbound_emails'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    to_addr = db.Column(db.String, nullable=False)
+    subject = db.Column(db.String, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    text = db.Column(db.Text)
+    status = db.Column(db.String, nullable=False, default='pending')  # pending | sending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When the row is next eligible: retry backoff while pending, lease expiry while sending
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = db.Column(db.Text)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    sent_at = db.Column(db.DateTime(timezone=True))
+    __table_args__ = (db.Index('ix_outbound_emails_status_next_attempt_at', 'status', 'next_attempt_at'),)
+
+
+class ShopifyWebhookEvent(db.Model):
+    """Append-only log of verified Shopify webhooks; shopify_ingest.py turns them into orders."""
+    __tablename__ = 'shopify_webhook_events'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    webhook_id = db.Column(db.String, nullable=False, unique=True)   # X-Shopify-Webhook-Id (retries reuse it)
+    topic = db.Column(db.String, nullable=False)
+    shop_domain = db.Column(db.String)
+    payload = db.Column(JSONB, nullable=False)
+    received_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    processed_at = db.Column(db.DateTime(timezone=True))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    __table_args__ = (
+        db.Index('ix_shopify_webhook_events_pending', 'received_at',
+                 postgresql_where=db.text('processed_at IS NULL')),
+    )
+
+
+class ShopifyOrder(db.Model):
+    __tablename__ = 'shopify_orders'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shopify_order_id = db.Column(db.BigInteger, nullable=False, unique=True)
+    name = db.Column(db.String)                 # e.g. "#1042"
+    email = db.Column(db.String, index=True)
+    shopify_customer_id = db.Column(db.BigInteger, index=True)
+    financial_status = db.Column(db.String)
+    currency = db.Column(db.String)
+    total_price = db.Column(db.Numeric(12, 2))
+    ordered_at = db.Column(db.DateTime(timezone=True))
+    webhook_event_id = db.Column(UUID(as_uuid=True), db.ForeignKey('shopify_webhook_events.id'))
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    line_items = db.relationship('ShopifyLineItem', backref='order', lazy='selectin')
+
+
+class ShopifyLineItem(db.Model):
+    __tablename__ = 'shopify_line_items'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    order_id = db.Column(UUID(as_uuid=True), db.ForeignKey('shopify_orders.id'), nullable=False, index=True)
+    shopify_line_item_id = db.Column(db.BigInteger, nullable=False, unique=True)
+    product_id = db.Column(db.String)
+    variant_id = db.Column(db.String)
+    sku = db.Column(db.String)
+    title = db.Column(db.String)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    price = db.Column(db.Numeric(12, 2))
+    template_id = db.Column(UUID(as_uuid=True), db.ForeignKey('card_templates.id'), index=True)
@@ -0,0 +1,119 @@
+# backend/passwords.py
+"""
+Password hashing for User.set_password / User.check_password.
+
+The hash method and its cost are configured with PASSWORD_HASH_METHOD, using
+werkzeug's method syntax:
+
+  pbkdf2:sha256            PBKDF2-HMAC-SHA256 at werkzeug's current iteration count (default)
+  pbkdf2:sha256:1200000    ... or a fixed count
+  scrypt:32768:8:1         scrypt, N=2**15, r=8, p=1 (memory-hard, ~32 MiB per hash)
+
+Stored hashes carry their own parameters, so old hashes keep verifying after
+the setting changes. ``needs_rehash()`` flags hashes made with another
+algorithm or a *lower* cost, and login rewrites them with the current
+parameters; a stronger stored hash is never rewritten down. Use
+scripts/bench_password_hash.py to pick a cost.
+
+Hashing runs on a small thread pool (PASSWORD_HASH_THREADS). hashlib releases
+the GIL while hashing, so a login storm is capped at that many cores. Callers
+that wait longer than PASSWORD_HASH_WAIT seconds for a slot get HasherBusy.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = "pbkdf2:sha256"   # werkzeug fills in its iteration count (1,000,000 on 3.1)
+
+
+class HasherBusy(Exception):
+    """Every hashing slot stayed taken for longer than the wait budget."""
+
+
+def _native_executor(threads: int):
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            # Patched threads are greenlets and would hash on the hub; use gevent's OS-thread pool
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers=threads)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix="password-hash")
+
+
+def _canonical_method(method: str) -> str:
+    """The method string werkzeug will store for ``method``, with its defaults filled in (no hashing)."""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    if name == "scrypt" and len(args) == 3:
+        return ":".join([name, *(str(int(a)) for a in args)])
+    if name == "pbkdf2" and len(args) <= 2:
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"unsupported PASSWORD_HASH_METHOD {method!r}")
+
+
+def _parse_method(method: str) -> tuple[str, int] | None:
+    """("pbkdf2:sha256", iterations) or ("scrypt", N*r*p) for a canonical werkzeug method."""
+    parts = method.split(":")
+    try:
+        if parts[0] == "pbkdf2" and len(parts) == 3:
+            return f"pbkdf2:{parts[1]}", int(parts[2])
+        if parts[0] == "scrypt" and len(parts) == 4:
+            n, r, p = (int(x) for x in parts[1:])
+            return "scrypt", n * r * p
+    except ValueError:
+        pass
+    return None
+
+
+class PasswordHasher:
+    def __init__(self, method: str = DEFAULT_METHOD, salt_length: int = 16,
+                 threads: int = 2, max_waiting: int = 32, wait: float = 10.0):
+        self.salt_length = salt_length
+        # Canonical form ("scrypt" -> "scrypt:32768:8:1"), to compare stored hashes against
+        self.method = _canonical_method(method)
+        self.wait = wait
+        self._pool = _native_executor(threads)
+        self._slots = threading.BoundedSemaphore(threads + max_waiting)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise HasherBusy("password hashing queue is full")
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, raw: str) -> str:
+        return self._run(generate_password_hash, raw, self.method, self.salt_length)
+
+    def verify(self, stored: str | None, raw: str) -> bool:
+        if not stored:
+            return False
+        return self._run(check_password_hash, stored, raw)
+
+    def needs_rehash(self, stored: str | None) -> bool:
+        """True when a stored hash used another algorithm, or the same one at a lower cost."""
+        if not stored:
+            return False
+        method = stored.split("$", 1)[0]
+        if method == self.method:
+            return False
+        have, want = _parse_method(method), _parse_method(self.method)
+        if have is None or want is None:
+            return True
+        return have[0] != want[0] or have[1] < want[1]
+
+
+hasher = PasswordHasher(
+    method=os.getenv("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+    threads=int(os.getenv("PASSWORD_HASH_THREADS", "2")),
+    max_waiting=int(os.getenv("PASSWORD_HASH_QUEUE", "32")),
+    wait=float(os.getenv("PASSWORD_HASH_WAIT", "10")),
+)
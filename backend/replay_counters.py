@@ -0,0 +1,168 @@
+# backend/replay_counters.py
+"""
+Replay protection for SUN read counters (CardInstance.last_ctr).
+
+A tag's counter only goes up, so a scan is fresh iff its ctr is above every
+counter accepted before. ``advance(card_id, ctr, known)`` answers that:
+
+  1. in-memory fast path: each process keeps the highest counter it has seen
+     per card (seeded from ``known``, the last_ctr of the row the caller
+     already loaded). Anything at or below it is a replay, answered without
+     touching the database.
+  2. REPLAY_COUNTER_MODE=strict (default): one conditional statement,
+       UPDATE card_instances SET last_ctr = :ctr
+        WHERE id = :id AND (last_ctr IS NULL OR last_ctr < :ctr) RETURNING id
+     This is an atomic compare-and-set across all workers. It replaces the
+     old read/compare/ORM-flush sequence, which let two workers accept the
+     same counter. The in-memory maximum is only raised once the caller's
+     transaction commits; a rolled-back UPDATE leaves it untouched.
+  3. REPLAY_COUNTER_MODE=buffered: the compare-and-set happens in memory,
+     and a background thread persists each card's highest counter every
+     REPLAY_COUNTER_FLUSH_INTERVAL seconds, with the same conditional UPDATE
+     as an executemany. Use it for showcase cards tapped hundreds of times an
+     hour. The trade-off: within one worker replays are still exact, but
+     across workers a counter is only known to the others after the flush,
+     so the same message could be accepted once per worker within that window.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import bindparam, event, or_, update
+from sqlalchemy.orm import Session
+
+from background import BackgroundWorker
+from models import db, CardInstance
+
+_instances = CardInstance.__table__
+_PENDING_KEY = "replay_counters_pending"
+
+
+class ReplayCounters(BackgroundWorker):
+    def __init__(self, mode: str = "strict", interval: float = 2.0, maxsize: int = 100_000):
+        super().__init__("replay-counters", interval)
+        if mode not in ("strict", "buffered"):
+            raise ValueError(f"unknown REPLAY_COUNTER_MODE {mode!r}")
+        self.app = None
+        self.mode = mode
+        self.maxsize = maxsize
+        self._max: OrderedDict = OrderedDict()   # card id -> highest accepted ctr (LRU)
+        self._pending: dict = {}                 # buffered mode: card id -> ctr to persist
+        self._lock = threading.Lock()
+        self.stats = {"accepted": 0, "replays_memory": 0, "replays_db": 0, "flushed": 0, "flushes": 0, "errors": 0}
+
+    def _remember(self, card_id, ctr: int):
+        # caller holds the lock
+        self._max[card_id] = ctr
+        self._max.move_to_end(card_id)
+        while len(self._max) > self.maxsize:
+            self._max.popitem(last=False)
+
+    def _seen(self, card_id, known) -> int:
+        # caller holds the lock
+        seen = self._max.get(card_id)
+        candidates = [c for c in (seen, known, self._pending.get(card_id)) if c is not None]
+        return max(candidates) if candidates else -1
+
+    def advance(self, card_id, ctr: int, known: int | None = None) -> bool:
+        """True if ``ctr`` is a fresh counter for this card (and is now recorded); False on replay."""
+        with self._lock:
+            if ctr <= self._seen(card_id, known):
+                self.stats["replays_memory"] += 1
+                return False
+            if self.mode == "buffered":
+                self._remember(card_id, ctr)
+                self._pending[card_id] = ctr
+                self.stats["accepted"] += 1
+                self.ensure_started()
+                return True
+
+        won = db.session.execute(
+            update(_instances)
+            .where(_instances.c.id == card_id, or_(_instances.c.last_ctr.is_(None), _instances.c.last_ctr < ctr))
+            .values(last_ctr=ctr)
+            .returning(_instances.c.id)
+        ).first() is not None
+        with self._lock:
+            self.stats["accepted" if won else "replays_db"] += 1
+        if won:
+            # Remembered on commit (see _apply_committed_counters): until then the UPDATE may still roll back
+            pending = db.session.info.setdefault(_PENDING_KEY, {})
+            pending[card_id] = max(ctr, pending.get(card_id, -1))
+        return won
+
+    def commit_seen(self, seen: dict):
+        """Raise the in-memory maxima to counters whose UPDATE has committed."""
+        with self._lock:
+            for card_id, ctr in seen.items():
+                if ctr > self._max.get(card_id, -1):
+                    self._remember(card_id, ctr)
+
+    def note_minted(self, card_id, ctr: int):
+        """A new instance was inserted with last_ctr=ctr."""
+        with self._lock:
+            self._remember(card_id, ctr)
+
+    def tick(self):
+        if self.app is None:
+            return
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        stmt = (
+            update(_instances)
+            .where(_instances.c.id == bindparam("b_id"),
+                   or_(_instances.c.last_ctr.is_(None), _instances.c.last_ctr < bindparam("b_ctr")))
+            .values(last_ctr=bindparam("b_ctr"))
+        )
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(stmt, [{"b_id": k, "b_ctr": v} for k, v in batch.items()])
+        except Exception as e:
+            with self._lock:
+                # Put them back for the next tick, keeping anything newer that arrived meanwhile
+                for k, v in batch.items():
+                    if v > self._pending.get(k, -1):
+                        self._pending[k] = v
+                self.stats["errors"] += 1
+            print(f"❌ Replay counter flush failed ({len(batch)} cards): {e}")
+            return
+        with self._lock:
+            self.stats["flushed"] += len(batch)
+            self.stats["flushes"] += 1
+
+
+counters = ReplayCounters()
+
+
+def advance(card_id, ctr: int, known: int | None = None) -> bool:
+    return counters.advance(card_id, ctr, known)
+
+
+def note_minted(card_id, ctr: int):
+    counters.note_minted(card_id, ctr)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_counters(session):
+    seen = session.info.pop(_PENDING_KEY, None)
+    if seen:
+        counters.commit_seen(seen)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_counters(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_replay_counters(app):
+    counters.app = app
+    counters.mode = os.getenv("REPLAY_COUNTER_MODE", counters.mode)
+    if counters.mode not in ("strict", "buffered"):
+        raise ValueError(f"unknown REPLAY_COUNTER_MODE {counters.mode!r}")
+    counters.interval = float(os.getenv("REPLAY_COUNTER_FLUSH_INTERVAL", str(counters.interval)))
+    counters.maxsize = int(os.getenv("REPLAY_COUNTER_CACHE_SIZE", str(counters.maxsize)))
+    if counters.mode == "buffered":
+        print(f"⚡ Replay counters buffered, flushed every {counters.interval}s")
@@ -1,13 +1,23 @@
 # routes_admin.py
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 import os
 import uuid
 
+import requests
+
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import select, or_
+from sqlalchemy import func, select, or_, insert, literal, union_all
+from sqlalchemy.exc import IntegrityError
 
-from models import db, CardTemplate, CardInstance, ScanEvent
+from models import db, Athlete, CardTemplate, CardInstance, ScanEvent, ScanDailyRollup, CardStatus
+from mail_queue import queue_stats
+from minting import allocate_serials, mint_instance, EditionCapReached
+from scan_log import log_scan
+from template_index import find_template
+from sun import verifier as sun_verifier, template_groups
 
 ADMIN_TOKEN = os.environ.get("ADMIN_SHARED_TOKEN", "")
 
@@ -22,47 +32,150 @@ def require_admin(fn):
 
 bp = Blueprint("admin_api", __name__, url_prefix="/api/admin")
 
-ETRNL_URL = "https://third-party.etrnl.app/v1/tags/verify-authenticity"
-ETRNL_KEY = os.environ.get("ETRNL_PRIVATE_KEY")
+def verify_tag(payload: dict, groups=()) -> dict:
+    """SUN check: local when the tag's keys are in the key store, else ETRNL (see sun.py)."""
+    return sun_verifier.verify(payload, groups)
 
-def verify_with_etrnl(payload: dict) -> dict:
-    import requests
-    r = requests.post(
-        ETRNL_URL,
-        json=payload,
-        headers={"API-KEY": ETRNL_KEY, "Content-Type": "application/json"},
-        timeout=10,
-    )
-    return r.json()
+TEMPLATES_DEFAULT_LIMIT = 100
+TEMPLATES_MAX_LIMIT = 500
+
+def _template_ids(series):
+    q = select(CardTemplate.id)
+    if series is not None:
+        q = q.join(Athlete, Athlete.id == CardTemplate.athlete_id).where(Athlete.series_number == series)
+    return q
 
-def _resolve_template(hint: str) -> CardTemplate | None:
-    """Allow templateId to be DB UUID, CSV/ETRNL id, or SKU (template_code)."""
-    if not hint:
+def _template_page(series, limit, offset):
+    """Subquery of the template ids on the requested page."""
+    return _template_ids(series).order_by(CardTemplate.created_at, CardTemplate.id).limit(limit).offset(offset).subquery()
+
+def _rolled_up_through(today):
+    """
+    Last UTC day whose scan_daily_rollups rows are complete.
+
+    The maintenance job re-rolls yesterday and today on every run, so a rollup
+    that already has rows for today was refreshed after yesterday ended. The
+    newest rolled day is otherwise assumed partial.
+    """
+    last = db.session.scalar(select(func.max(ScanDailyRollup.day)))
+    if last is None:
         return None
-    try:
-        tid = uuid.UUID(str(hint))
-    except Exception:
-        tid = None
-    if tid:
-        t = db.session.get(CardTemplate, tid)
-        if t:
-            return t
-    return db.session.execute(
-        select(CardTemplate).where(
-            or_(
-                CardTemplate.etrnl_url_group_id == hint,  # e.g. 000000000009
-                CardTemplate.template_code == hint,       # e.g. SL-REG
-            )
+    return today - timedelta(days=1) if last >= today else last - timedelta(days=1)
+
+def _utc_midnight(day):
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def _scan_counts(page_ids, now):
+    """
+    Per-template scans over the last 24 hours and the last 7 days (both rolling).
+
+    scans_24h is a raw count (one or two partitions, via ix_scans_created_at).
+    For scans_7d, the whole UTC days inside the window come from
+    scan_daily_rollups; the raw scans partitions are only read for the
+    window's partial first day and for days not rolled up yet (normally today).
+    """
+    week_start = now - timedelta(days=7)
+    first_whole = week_start.date() + timedelta(days=1)
+    rolled = _rolled_up_through(now.date())
+    raw_from = max(first_whole, rolled + timedelta(days=1)) if rolled else first_whole
+
+    from_rollup = (
+        select(
+            ScanDailyRollup.template_id,
+            literal(0).label("day"),
+            func.sum(ScanDailyRollup.scans).label("week"),
         )
-    ).scalar_one_or_none()
+        .where(ScanDailyRollup.day >= first_whole, ScanDailyRollup.day < raw_from,
+               ScanDailyRollup.template_id.in_(page_ids))
+        .group_by(ScanDailyRollup.template_id)
+    )
+    # created_at bounds first so only the partitions those ranges cover are read
+    week_raw = (
+        select(CardInstance.template_id, literal(0).label("day"), func.count().label("week"))
+        .select_from(ScanEvent)
+        .join(CardInstance, CardInstance.id == ScanEvent.card_instance_id)
+        .where(
+            ScanEvent.created_at >= week_start,
+            or_(ScanEvent.created_at < _utc_midnight(first_whole), ScanEvent.created_at >= _utc_midnight(raw_from)),
+            CardInstance.template_id.in_(page_ids),
+        )
+        .group_by(CardInstance.template_id)
+    )
+    day_raw = (
+        select(CardInstance.template_id, func.count().label("day"), literal(0).label("week"))
+        .select_from(ScanEvent)
+        .join(CardInstance, CardInstance.id == ScanEvent.card_instance_id)
+        .where(ScanEvent.created_at >= now - timedelta(hours=24), CardInstance.template_id.in_(page_ids))
+        .group_by(CardInstance.template_id)
+    )
+    parts = union_all(from_rollup, week_raw, day_raw).subquery()
+    return (
+        select(
+            parts.c.template_id,
+            func.sum(parts.c.day).label("scans_24h"),
+            func.sum(parts.c.week).label("scans_7d"),
+        )
+        .group_by(parts.c.template_id)
+        .subquery()
+    )
+
+def _templates_with_stats(page):
+    """One statement: page templates joined to per-template instance and scan aggregates."""
+    now = datetime.now(timezone.utc)
+    page_ids = select(page.c.id)
+    inst = (
+        select(
+            CardInstance.template_id,
+            func.count().label("instances"),
+            func.count().filter(CardInstance.status == CardStatus.claimed).label("claimed"),
+            func.count().filter(CardInstance.status == CardStatus.shipped).label("shipped"),
+        )
+        .where(CardInstance.template_id.in_(page_ids))
+        .group_by(CardInstance.template_id)
+        .subquery()
+    )
+    scans = _scan_counts(page_ids, now)
+    return db.session.execute(
+        select(CardTemplate, inst.c.instances, inst.c.claimed, inst.c.shipped, scans.c.scans_24h, scans.c.scans_7d)
+        .join(page, page.c.id == CardTemplate.id)
+        .outerjoin(inst, inst.c.template_id == CardTemplate.id)
+        .outerjoin(scans, scans.c.template_id == CardTemplate.id)
+        .order_by(CardTemplate.created_at, CardTemplate.id)
+    ).all()
 
 @bp.get("/templates")
 @require_admin
 def list_templates():
-    rows = db.session.execute(select(CardTemplate)).scalars().all()
+    """
+    Query params (all optional):
+      stats=1       add per-template aggregates (instances, claimed, unclaimed, shipped,
+                    scans_24h, scans_7d, remaining) computed in the same query
+      series=<n>    only templates whose athlete is in series n
+      limit/offset  page through templates (limit defaults to TEMPLATES_DEFAULT_LIMIT,
+                    capped at TEMPLATES_MAX_LIMIT)
+
+    Returns { "items": [...], "total": <matching templates>, "next_offset": <int|null> }.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", TEMPLATES_DEFAULT_LIMIT)), 1), TEMPLATES_MAX_LIMIT)
+        offset = max(int(request.args.get("offset", 0)), 0)
+        series = int(request.args["series"]) if request.args.get("series") else None
+    except ValueError:
+        return jsonify({"error": "limit, offset and series must be integers"}), 400
+    with_stats = request.args.get("stats") in ("1", "true", "yes")
+
+    page = _template_page(series, limit, offset)
+    if with_stats:
+        rows = _templates_with_stats(page)
+    else:
+        rows = db.session.execute(
+            select(CardTemplate).join(page, page.c.id == CardTemplate.id)
+            .order_by(CardTemplate.created_at, CardTemplate.id)
+        ).all()
+
     out = []
-    for t in rows:
-        out.append({
+    for t, *agg in rows:
+        item = {
             "id": str(t.id),
             "version": t.version,
             "athlete_id": str(t.athlete_id),
@@ -72,8 +185,23 @@ def list_templates():
             "edition_cap": t.edition_cap,
             "etrnl_url_group_id": t.etrnl_url_group_id,
             "template_code": t.template_code,
-        })
-    return jsonify(out)
+        }
+        if with_stats:
+            instances, claimed, shipped, scans_24h, scans_7d = (int(v or 0) for v in agg)
+            item["stats"] = {
+                "instances": instances,
+                "claimed": claimed,
+                "unclaimed": instances - claimed,
+                "shipped": shipped,
+                "scans_24h": scans_24h,
+                "scans_7d": scans_7d,
+                "remaining": None if t.edition_cap is None else max(t.edition_cap - (t.minted_count or 0), 0),
+            }
+        out.append(item)
+
+    total = db.session.scalar(select(func.count()).select_from(_template_ids(series).subquery()))
+    next_offset = offset + limit if offset + limit < total else None
+    return jsonify({"items": out, "total": total, "next_offset": next_offset})
 
 @bp.post("/bind")
 @require_admin
@@ -94,7 +222,7 @@ def bind_by_scan():
     if not template_hint:
         return jsonify({"error": "templateId required"}), 400
 
-    template = _resolve_template(template_hint)
+    template = find_template(template_hint)
     if not template:
         return jsonify({"error": "unknown template"}), 404
 
@@ -103,15 +231,13 @@ def bind_by_scan():
     tt_curr = None
     tt_perm = None
 
-    # Prefer verifying via ETRNL if enc/eCode present
-    if tag_id and data.get("enc") and data.get("eCode"):
-        payload = {"tagId": tag_id, "eCode": data["eCode"], "enc": data["enc"]}
-        if "tt" in data:
-            payload["tt"] = data["tt"]
-        elif "cmac" in data:
-            payload["cmac"] = data["cmac"]
-
-        res = verify_with_etrnl(payload)
+    # Prefer verifying the SUN message if enc/eCode present
+    payload = _sun_payload(data)
+    if payload:
+        try:
+            res = verify_tag(payload, template_groups(template_hint, template))
+        except requests.RequestException:
+            return jsonify({"error": "verify upstream error"}), 502
         if not res.get("success") or not res.get("authentic"):
             return jsonify({"error": "tag not authentic"}), 400
 
@@ -134,36 +260,201 @@ def bind_by_scan():
         return jsonify({"error": "already bound", "cardId": str(existing.id)}), 409
 
     # Mint & record
-    from sqlalchemy import select as sel
-    with db.session.begin_nested():  # safe if a transaction already exists
-        t_locked = db.session.execute(
-            sel(CardTemplate).where(CardTemplate.id == template.id).with_for_update()
-        ).scalar_one()
-
-        next_serial = (t_locked.minted_count or 0) + 1
-        t_locked.minted_count = next_serial
-
-        inst = CardInstance(
-            template_id=t_locked.id,
-            serial_no=next_serial,
-            etrnl_tag_uid=uid,
-            etrnl_tag_id=tag_id,
-            last_ctr=ctr,
-        )
-        db.session.add(inst)
-        db.session.flush()
-
-        db.session.add(ScanEvent(
-            card_instance_id=inst.id,
-            tag_id=tag_id,
-            uid=uid,
-            ctr=ctr,
-            authentic=True,
-            ip=request.remote_addr,
-            user_agent=request.headers.get("User-Agent"),
-            tt_curr=tt_curr,
-            tt_perm=tt_perm,
-        ))
+    try:
+        inst_id, _ = mint_instance(template.id, tag_uid=uid, tag_id=tag_id, last_ctr=ctr)
+    except EditionCapReached:
+        db.session.rollback()
+        return jsonify({"error": "edition cap reached"}), 409
+
+    log_scan(
+        card_instance_id=inst_id,
+        tag_id=tag_id,
+        uid=uid,
+        ctr=ctr,
+        authentic=True,
+        ip=request.remote_addr,
+        user_agent=request.headers.get("User-Agent"),
+        tt_curr=tt_curr,
+        tt_perm=tt_perm,
+    )
 
     db.session.commit()
-    return jsonify({"ok": True, "state": "unclaimed", "cardId": str(inst.id)})
\ No newline at end of file
+    return jsonify({"ok": True, "state": "unclaimed", "cardId": str(inst_id)})
+
+
+BIND_BATCH_MAX = int(os.environ.get("BIND_BATCH_MAX", "1000"))
+BIND_BATCH_CONCURRENCY = int(os.environ.get("BIND_BATCH_CONCURRENCY", "16"))
+
+def _sun_payload(item: dict) -> dict | None:
+    """The SUN fields of a bind body, or None when it carries no signed message."""
+    tag_id = item.get("tagId")
+    if not (tag_id and item.get("enc") and item.get("eCode")):
+        return None
+    payload = {"tagId": tag_id, "eCode": item["eCode"], "enc": item["enc"]}
+    if "tt" in item:
+        payload["tt"] = item["tt"]
+    elif "cmac" in item:
+        payload["cmac"] = item["cmac"]
+    return payload
+
+def _batch_verified(res: dict) -> dict:
+    if not res.get("success") or not res.get("authentic"):
+        return {"error": "tag not authentic"}
+    return {
+        "uid": res.get("uid"),
+        "ctr": int(res.get("ctr", 0) or 0),
+        "tt_curr": res.get("ttCurrStatus"),
+        "tt_perm": res.get("ttPermStatus"),
+    }
+
+def _verify_batch_item(item: dict, groups=()) -> dict:
+    """Verify one batch entry (or accept its raw uid); runs off the request thread."""
+    payload = _sun_payload(item)
+    if payload:
+        try:
+            res = verify_tag(payload, groups)
+        except requests.RequestException:
+            return {"error": "verify upstream error"}
+        return _batch_verified(res)
+    if item.get("uid") and item.get("tagId"):
+        # unverified path (admin-only)
+        return {"uid": item["uid"], "ctr": 0, "tt_curr": None, "tt_perm": None}
+    return {"error": "provide (enc,eCode,tagId,cmac/tt) or (uid,tagId)"}
+
+@bp.post("/bind/batch")
+@require_admin
+def bind_batch():
+    """
+    Register a production run in one request.
+
+    Body: { "templateId": "<default uuid|sku|ext>", "items": [ <bind body>, ... ] }
+    Each item takes the same fields as /bind; its own "templateId" overrides the default.
+    Tags are verified concurrently, serials are reserved in one block per template, and all
+    instances + scan events are bulk-inserted in a single transaction.
+    Returns one result per item, in request order.
+    """
+    data = request.get_json(force=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items required"}), 400
+    if len(items) > BIND_BATCH_MAX:
+        return jsonify({"error": f"at most {BIND_BATCH_MAX} items per batch"}), 413
+
+    results = [
+        {"index": i, "tagId": it.get("tagId") if isinstance(it, dict) else None, "ok": False}
+        for i, it in enumerate(items)
+    ]
+
+    # Resolve each distinct template hint once
+    templates = {}
+    for i, it in enumerate(items):
+        if not isinstance(it, dict):
+            results[i]["error"] = "invalid item"
+            continue
+        hint = it.get("templateId") or data.get("templateId")
+        if not hint:
+            results[i]["error"] = "templateId required"
+            continue
+        if hint not in templates:
+            templates[hint] = find_template(hint)
+        if not templates[hint]:
+            results[i]["error"] = "unknown template"
+
+    pending = [i for i, r in enumerate(results) if "error" not in r]
+
+    # Verify locally in one pass where we hold the keys, the rest against the
+    # upstream concurrently (no DB access in the workers)
+    groups = {}
+    for i in pending:
+        hint = items[i].get("templateId") or data.get("templateId")
+        groups[i] = template_groups(hint, templates[hint])
+    signed = [i for i in pending if _sun_payload(items[i])]
+    local = sun_verifier.verify_many([_sun_payload(items[i]) for i in signed], [groups[i] for i in signed])
+    verified = {i: _batch_verified(res) for i, res in zip(signed, local) if res is not None}
+    remote = [i for i in pending if i not in verified]
+    with ThreadPoolExecutor(max_workers=BIND_BATCH_CONCURRENCY) as pool:
+        verified.update(zip(remote, pool.map(lambda i: _verify_batch_item(items[i], groups[i]), remote)))
+
+    for i in pending:
+        if "error" in verified[i]:
+            results[i]["error"] = verified[i]["error"]
+    pending = [i for i in pending if "error" not in results[i]]
+
+    # Drop tags already bound (one query) and duplicates within the batch
+    uids = {verified[i]["uid"] for i in pending}
+    tag_ids = {items[i]["tagId"] for i in pending}
+    bound = {}
+    for inst_id, uid, tag_id in db.session.execute(
+        select(CardInstance.id, CardInstance.etrnl_tag_uid, CardInstance.etrnl_tag_id).where(
+            or_(CardInstance.etrnl_tag_uid.in_(uids), CardInstance.etrnl_tag_id.in_(tag_ids))
+        )
+    ):
+        bound[uid] = bound[tag_id] = str(inst_id)
+
+    seen = set()
+    by_template = {}
+    for i in pending:
+        uid, tag_id = verified[i]["uid"], items[i]["tagId"]
+        if uid in bound or tag_id in bound:
+            results[i].update(error="already bound", cardId=bound.get(uid) or bound.get(tag_id))
+        elif uid in seen or tag_id in seen:
+            results[i]["error"] = "duplicate in batch"
+        else:
+            seen.update((uid, tag_id))
+            template = templates[items[i].get("templateId") or data.get("templateId")]
+            by_template.setdefault(template.id, []).append(i)
+
+    # One serial block per template, then bulk inserts
+    instance_rows, scan_rows = [], []
+    ip, agent = request.remote_addr, request.headers.get("User-Agent")
+    for template_id, idxs in by_template.items():
+        try:
+            serials = allocate_serials(template_id, len(idxs))
+        except EditionCapReached:
+            for i in idxs:
+                results[i]["error"] = "edition cap reached"
+            continue
+        for i, serial in zip(idxs, serials):
+            v = verified[i]
+            inst_id = uuid.uuid4()
+            instance_rows.append({
+                "id": inst_id,
+                "template_id": template_id,
+                "serial_no": serial,
+                "etrnl_tag_uid": v["uid"],
+                "etrnl_tag_id": items[i]["tagId"],
+                "last_ctr": v["ctr"],
+                "status": CardStatus.unassigned,
+            })
+            scan_rows.append({
+                "card_instance_id": inst_id,
+                "tag_id": items[i]["tagId"],
+                "uid": v["uid"],
+                "ctr": v["ctr"],
+                "authentic": True,
+                "ip": ip,
+                "user_agent": agent,
+                "tt_curr": v["tt_curr"],
+                "tt_perm": v["tt_perm"],
+            })
+            results[i].update(ok=True, cardId=str(inst_id), serial_no=serial)
+
+    try:
+        if instance_rows:
+            db.session.execute(insert(CardInstance.__table__), instance_rows)
+            db.session.execute(insert(ScanEvent.__table__), scan_rows)
+        db.session.commit()
+    except IntegrityError:
+        # a tag was bound concurrently; nothing from this batch was written
+        db.session.rollback()
+        return jsonify({"error": "conflict, retry the batch"}), 409
+
+    minted = sum(1 for r in results if r["ok"])
+    return jsonify({"ok": True, "minted": minted, "failed": len(results) - minted, "results": results})
+
+
+@bp.get("/mail/stats")
+@require_admin
+def mail_stats():
+    """Outbound mail queue depth and this worker's sender counters."""
+    return jsonify(queue_stats())
@@ -1,6 +1,8 @@
 # backend/routes_auth.py
+import json
 import os
 import re
+import time
 import uuid
 from urllib.parse import urljoin, urlencode, urlparse, parse_qs
 
@@ -9,29 +11,81 @@ from authlib.integrations.flask_client import OAuth
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 from models import db, User  # absolute import to match your app layout
+from auth import current_user, generate_auth_token
+from mail_queue import enqueue_email
+from passwords import HasherBusy
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
 # ---------------- OAuth registry ----------------
 oauth = OAuth()
 
+GOOGLE_METADATA_URL = "https://accounts.google.com/.well-known/openid-configuration"
+_metadata_cache_path = None
+_metadata_cache_ttl = 86400.0
+
 def init_oauth(app):
-    """Initialize Authlib and register the Google client."""
+    """Initialize Authlib and register the Google client.
+
+    Nothing is fetched here. The discovery document is loaded on the first
+    Google login, from a local cache file when fresh (GOOGLE_OIDC_METADATA_CACHE,
+    default instance/google-openid-configuration.json, GOOGLE_OIDC_METADATA_TTL
+    seconds), otherwise from Google and then written to that file.
+    """
+    global _metadata_cache_path, _metadata_cache_ttl
+    _metadata_cache_path = os.getenv(
+        "GOOGLE_OIDC_METADATA_CACHE", os.path.join(app.instance_path, "google-openid-configuration.json")
+    )
+    _metadata_cache_ttl = float(os.getenv("GOOGLE_OIDC_METADATA_TTL", str(_metadata_cache_ttl)))
     oauth.init_app(app)
     oauth.register(
         name="google",
         client_id=os.getenv("GOOGLE_CLIENT_ID"),
         client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        server_metadata_url=GOOGLE_METADATA_URL,
         client_kwargs={"scope": "openid email profile"},
     )
 
+def _read_metadata_cache() -> dict | None:
+    try:
+        if time.time() - os.path.getmtime(_metadata_cache_path) > _metadata_cache_ttl:
+            return None
+        with open(_metadata_cache_path) as f:
+            metadata = json.load(f)
+        return metadata if metadata.get("authorization_endpoint") else None
+    except (OSError, TypeError, ValueError):
+        return None
+
+def _write_metadata_cache(metadata: dict):
+    try:
+        os.makedirs(os.path.dirname(_metadata_cache_path), exist_ok=True)
+        tmp = f"{_metadata_cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({k: v for k, v in metadata.items() if k != "_loaded_at"}, f)
+        os.replace(tmp, _metadata_cache_path)
+    except (OSError, TypeError) as e:
+        print(f"⚠️  Could not cache Google OIDC metadata: {e}")
+
+def _ensure_metadata(client):
+    """Load discovery metadata once per process, preferring the cache file."""
+    if "_loaded_at" in client.server_metadata:
+        return
+    cached = _read_metadata_cache() if _metadata_cache_path else None
+    if cached:
+        # Authlib skips its own fetch once _loaded_at is set
+        client.server_metadata.update(cached, _loaded_at=time.time())
+        return
+    client.load_server_metadata()
+    if _metadata_cache_path:
+        _write_metadata_cache(client.server_metadata)
+
 def get_oauth_client():
     client = oauth.create_client("google")
     if not client:
         raise RuntimeError(
             "OAuth is not initialized. Call init_oauth(app) in app.py before registering this blueprint."
         )
+    _ensure_metadata(client)
     return client
 
 # ---------------- helpers ----------------
@@ -58,20 +112,6 @@ def _serializer(kind: str = 'email') -> URLSafeTimedSerializer:
 def valid_email(s: str) -> bool:
     return bool(re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", s or ""))
 
-def _generate_auth_token(user_id):
-    """Generate a secure auth token for URL-based authentication"""
-    serializer = URLSafeTimedSerializer(current_app.secret_key)
-    return serializer.dumps(str(user_id), salt=current_app.config.get('AUTH_TOKEN_SALT', 'auth-token'))
-
-def _verify_auth_token(token):
-    """Verify and extract user ID from auth token"""
-    try:
-        serializer = URLSafeTimedSerializer(current_app.secret_key)
-        user_id = serializer.loads(token, salt=current_app.config.get('AUTH_TOKEN_SALT', 'auth-token'), max_age=3600)  # 1 hour expiry
-        return user_id
-    except (BadSignature, SignatureExpired):
-        return None
-
 def _id_str(val) -> str:
     """Always return a plain string for IDs; prefer hex (no dashes)."""
     if isinstance(val, uuid.UUID):
@@ -100,94 +140,21 @@ def user_json(u: User) -> dict:
         "date_of_birth": getattr(u, "date_of_birth", None),
     }
 
-# ---------------- mail helper ----------------
-try:
-    from mailer import send_email  # your real mailer (SendGrid/SMTP)
-except Exception:
-    def send_email(to: str, subject: str, html: str, text: str | None = None):
-        # console fallback
-        print("\n=== EMAIL (console) ===")
-        print("To:", to)
-        print("Subject:", subject)
-        print("Text:", text or "")
-        print("HTML:\n", html)
-        print("=======================\n")
-        return True
-
 # ---------------- session endpoints ----------------
 @bp.get("/me")
 def me():
-    # Try auth token from query parameter first (for Safari mobile compatibility)
     auth_token = request.args.get('auth_token')
     print(f"🔍 /me endpoint: auth_token={auth_token[:50] + '...' if auth_token else None}, sid={session.get('uid')}, session_id={session.get('_id', 'None')}, user_agent={request.headers.get('User-Agent', 'Unknown')[:50]}...")
-    
-    if auth_token:
-        user_id = _verify_auth_token(auth_token)
-        if user_id:
-            uid = _uuid(user_id)
-            if uid:
-                u = db.session.get(User, uid)
-                if u:
-                    print(f"✅ User found via auth token: {u.email}")
-                    response = jsonify({"user": user_json(u)})
-                    # Explicitly set CORS headers
-                    response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
-                    response.headers['Access-Control-Allow-Credentials'] = 'true'
-                    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-                    return response
-        print(f"❌ Invalid auth token: {auth_token[:20]}...")
-    
-    # Try Authorization header as fallback
-    auth_header = request.headers.get('Authorization')
-    if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header[7:]  # Remove 'Bearer ' prefix
-        user_id = _verify_auth_token(token)
-        if user_id:
-            uid = _uuid(user_id)
-            if uid:
-                u = db.session.get(User, uid)
-                if u:
-                    print(f"✅ User found via auth header: {u.email}")
-                    response = jsonify({"user": user_json(u)})
-                    # Explicitly set CORS headers
-                    response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
-                    response.headers['Access-Control-Allow-Credentials'] = 'true'
-                    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-                    return response
-        print(f"❌ Invalid auth header token: {token[:20]}...")
-    
-    # Fallback to session-based authentication
-    sid = session.get("uid")
-    if not sid:
-        print("❌ No session ID found")
-        response = jsonify({"user": None})
-        # Explicitly set CORS headers
-        response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
-        response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-        return response
-    uid = _uuid(sid)
-    if not uid:
-        print(f"❌ Invalid session ID: {sid}")
-        session.clear()
-        response = jsonify({"user": None})
-        # Explicitly set CORS headers
-        response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
-        response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-        return response
-    u = db.session.get(User, uid)
-    if not u:
-        print(f"❌ User not found for UID: {uid}")
-        session.clear()
-        response = jsonify({"user": None})
-        # Explicitly set CORS headers
-        response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
-        response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-        return response
-    print(f"✅ User found: {u.email}")
-    response = jsonify({"user": user_json(u)})
+
+    # auth_token param, then Authorization header, then the session (see auth.py)
+    u = current_user()
+    if u:
+        print(f"✅ User found: {u.email}")
+    else:
+        print("❌ No authenticated user")
+        if session.get("uid"):
+            session.clear()  # stale or malformed session uid
+    response = jsonify({"user": user_json(u) if u else None})
     # Explicitly set CORS headers
     response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
     response.headers['Access-Control-Allow-Credentials'] = 'true'
@@ -212,22 +179,10 @@ def update_profile():
     
     current_app.logger.info("Update profile endpoint hit")
     
-    sid = session.get("uid")
-    if not sid:
-        current_app.logger.warning("No session ID found")
-        return jsonify({"ok": False, "error": "not_logged_in"}), 401
-    
-    uid = _uuid(sid)
-    if not uid:
-        current_app.logger.warning("Invalid session ID: %s", sid)
-        session.clear()
-        return jsonify({"ok": False, "error": "invalid_session"}), 401
-    
-    user = db.session.get(User, uid)
+    user = current_user()
     if not user:
-        current_app.logger.warning("User not found for ID: %s", uid)
-        session.clear()
-        return jsonify({"ok": False, "error": "user_not_found"}), 404
+        current_app.logger.warning("No authenticated user")
+        return jsonify({"ok": False, "error": "not_logged_in"}), 401
     
     data = request.get_json(force=True) or {}
     name = data.get("name")
@@ -269,8 +224,6 @@ def google_start():
 
 @bp.get("/google/callback")
 def google_cb():
-    client = get_oauth_client()
-    
     # Debug: Log the incoming request parameters
     print(f"🔍 Google callback debug:")
     print(f"  - State param: {request.args.get('state')}")
@@ -279,6 +232,7 @@ def google_cb():
     print(f"  - User agent: {request.headers.get('User-Agent', 'Unknown')[:50]}...")
     
     try:
+        client = get_oauth_client()
         token = client.authorize_access_token()
 
         # userinfo endpoint (from discovery doc)
@@ -334,7 +288,7 @@ def google_cb():
     session["uid"] = _id_str(user.id)
     
     # Generate auth token for URL-based authentication (Safari mobile compatibility)
-    auth_token = _generate_auth_token(user.id)
+    auth_token = generate_auth_token(user.id)
     
     print(f"🔐 Google callback: Set session uid={session['uid']}, auth_token={auth_token[:20]}..., user_agent={request.headers.get('User-Agent', 'Unknown')[:50]}...")
     
@@ -386,7 +340,10 @@ def signup():
             pass  # Invalid date format, skip
 
     u = User(**new_kwargs)
-    u.set_password(password)
+    try:
+        u.set_password(password)
+    except HasherBusy:
+        return jsonify({"ok": False, "error": "busy"}), 503, {"Retry-After": "2"}
     db.session.add(u)
     db.session.commit()
     
@@ -413,8 +370,8 @@ def signup():
     print(f"🔗 Verification URL: {verify_url}")
     
     try:
-        send_email(u.email, "Verify your email", html, f"Open this link to verify: {verify_url}")
-        print(f"✅ Email sent successfully to {u.email}")
+        enqueue_email(u.email, "Verify your email", html, f"Open this link to verify: {verify_url}")
+        print(f"✅ Email queued for {u.email}")
     except Exception as e:
         print(f"❌ Email sending failed: {e}")
         # Don't fail the signup if email fails
@@ -429,10 +386,17 @@ def login_password():
     password = data.get("password") or ""
 
     u = User.query.filter_by(email=email).first()
-    if not u or not u.check_password(password):
-        return jsonify({"ok": False, "error": "invalid_credentials"}), 401
-    if not getattr(u, "email_verified", False):
-        return jsonify({"ok": False, "error": "email_not_verified"}), 403
+    try:
+        if not u or not u.check_password(password):
+            return jsonify({"ok": False, "error": "invalid_credentials"}), 401
+        if not getattr(u, "email_verified", False):
+            return jsonify({"ok": False, "error": "email_not_verified"}), 403
+        if u.password_needs_rehash():
+            # Stored with older PASSWORD_HASH_METHOD parameters: upgrade while we have the plaintext
+            u.set_password(password)
+            db.session.commit()
+    except HasherBusy:
+        return jsonify({"ok": False, "error": "busy"}), 503, {"Retry-After": "2"}
 
     session["uid"] = _id_str(u.id)
     return jsonify({"ok": True, "user": user_json(u)})
@@ -463,7 +427,7 @@ def verify_email():
     session["uid"] = _id_str(u.id)
     
     # Generate auth token for URL-based authentication (Safari mobile compatibility)
-    auth_token = _generate_auth_token(u.id)
+    auth_token = generate_auth_token(u.id)
     
     print(f"✅ Email verification: Set session uid={session['uid']}, auth_token={auth_token[:20]}...")
     
@@ -503,8 +467,8 @@ def verify_resend():
     print(f"🔗 Verification URL: {verify_url}")
     
     try:
-        send_email(u.email, "Verify your email", html, f"Open this link to verify: {verify_url}")
-        print(f"✅ Email resent successfully to {u.email}")
+        enqueue_email(u.email, "Verify your email", html, f"Open this link to verify: {verify_url}")
+        print(f"✅ Email re-queued for {u.email}")
     except Exception as e:
         print(f"❌ Email resending failed: {e}")
         current_app.logger.exception("Email resending error: %s", e)
@@ -532,7 +496,7 @@ def password_forgot():
                   <p><a href="{reset_url}">Reset your password</a></p>
                   <p>If you didn't request this, you can ignore this email.</p>
                 """
-                send_email(u.email, "Reset your password", html, f"Open this link: {reset_url}")
+                enqueue_email(u.email, "Reset your password", html, f"Open this link: {reset_url}")
     except Exception as e:
         current_app.logger.exception("password_forgot error: %s", e)
     return jsonify({'ok': True})
@@ -566,7 +530,10 @@ def password_reset():
         return jsonify({'ok': False, 'error': 'not_found'}), 404
 
     # Set new password
-    u.set_password(new_pw)
+    try:
+        u.set_password(new_pw)
+    except HasherBusy:
+        return jsonify({'ok': False, 'error': 'busy'}), 503, {'Retry-After': '2'}
 
     # ✅ Consider reset as proof of email ownership
     if hasattr(User, 'email_verified') and not getattr(u, 'email_verified', False):
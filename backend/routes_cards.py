@@ -1,7 +1,11 @@
 from flask import Blueprint, jsonify, session, request
 from models import db, CardInstance, CardTemplate, Athlete, CardStatus
-from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from athlete_cache import cache as athlete_cache, athlete_version
+from etags import make_etag, not_modified, with_etag
+from auth import current_user, current_user_id
+from routes_auth import user_json
 import uuid as uuidlib
 
 bp = Blueprint('cards_api', __name__, url_prefix='/api/cards')
@@ -10,25 +14,131 @@ def _uuid(val):
     try: return uuidlib.UUID(str(val))
     except Exception: return None
 
-def _verify_auth_token(token):
-    """Verify and extract user ID from auth token"""
-    try:
-        serializer = URLSafeTimedSerializer(current_app.secret_key)
-        user_id = serializer.loads(token, salt=current_app.config.get('AUTH_TOKEN_SALT', 'auth-token'), max_age=3600)  # 1 hour expiry
-        return user_id
-    except (BadSignature, SignatureExpired):
-        return None
+# Max statements GET /api/cards/<id> may issue; see scripts/check_card_query_budget.py
+CARD_QUERY_BUDGET = 4
+
+def load_card(card_id, profile: bool = True):
+    """Fetch a CardInstance with its template, athlete and profile rows in one go.
+
+    The to-one chain (template -> athlete -> stats) is joined into the main
+    statement; with ``profile`` the three list relationships are fetched with
+    one SELECT ... IN each, so a card view costs CARD_QUERY_BUDGET statements
+    instead of 7+. Pass ``profile=False`` when the athlete document is likely
+    cached: the lists then lazy-load (same statement count) only on a miss.
+    """
+    return db.session.execute(
+        select(CardInstance).options(*card_load_options(profile)).where(CardInstance.id == card_id)
+    ).scalar_one_or_none()
+
+def card_load_options(profile: bool = True) -> list:
+    """Loader options for load_card(); add them to any other CardInstance query that will render a card."""
+    athlete = joinedload(CardInstance.template).joinedload(CardTemplate.athlete)
+    options = [athlete.joinedload(Athlete.stats)]
+    if profile:
+        options += [
+            athlete.selectinload(Athlete.achievements),
+            athlete.selectinload(Athlete.equipment),
+            athlete.selectinload(Athlete.qualifications),
+        ]
+    return options
+
+def athlete_json(ath) -> dict:
+    """Serialized athlete profile, shared by every template/card of that athlete."""
+    return {
+        'full_name': ath.full_name,
+        'series_number': ath.series_number,
+        'card_number': ath.card_number,
+        'dob': ath.dob.isoformat() if ath.dob else None,
+        'sport': ath.sport,
+        'discipline': ath.discipline.value if hasattr(ath.discipline, 'value') else ath.discipline,
+        'nationality': ath.nationality,
+        'hometown': ath.hometown,
+        'handedness': ath.handedness.value if hasattr(ath.handedness, 'value') else ath.handedness,
+        'world_ranking': ath.world_ranking,
+        'best_world_ranking': ath.best_world_ranking,
+        'intl_debut_year': ath.intl_debut_year,
+        'bio_short': ath.bio_short,
+        'bio_long': ath.bio_long,
+        'quote_text': ath.quote_text,
+        'quote_source': ath.quote_source,
+        'card_image_url': ath.card_image_url,
+        'card_back_url': ath.card_back_url,
+        'hero_image_url': ath.hero_image_url,
+        'video_url': ath.video_url,
+        'quote_photo_url': ath.quote_photo_url,
+        'action_photo_url': ath.action_photo_url,
+        'qualification_image_url': ath.qualification_image_url,
+        'achievements': [
+            {
+                'title': ach.title,
+                'result': ach.result,
+                'medal': ach.medal.value if hasattr(ach.medal, 'value') else ach.medal,
+                'display_order': ach.display_order,
+                'notes': ach.notes
+            }
+            for ach in ath.achievements
+        ],
+        'equipment': [
+            {
+                'category': eq.category,
+                'brand': eq.brand,
+                'model': eq.model,
+                'display_order': eq.display_order
+            }
+            for eq in ath.equipment
+        ],
+        'qualifications': [
+            {
+                'year': qual.year,
+                'score': float(qual.score) if qual.score else None,
+                'event': qual.event
+            }
+            for qual in ath.qualifications
+        ],
+        'stats': {
+            'win_percentage': float(ath.stats.win_percentage) if ath.stats and ath.stats.win_percentage else None,
+            'average_arrow': float(ath.stats.average_arrow) if ath.stats and ath.stats.average_arrow else None,
+            'tiebreak_win_rate': float(ath.stats.tiebreak_win_rate) if ath.stats and ath.stats.tiebreak_win_rate else None,
+            'extras': ath.stats.extras if ath.stats and ath.stats.extras else {}
+        },
+        'socials': ath.socials or {},
+        'sponsors': ath.sponsors or []
+    }
+
+def cached_athlete_json(ath) -> dict:
+    version = athlete_version(ath)
+    doc = athlete_cache.get(ath.id, version)
+    if doc is None:
+        doc = athlete_json(ath)
+        athlete_cache.set(ath.id, version, doc)
+    return doc
+
+def card_etag(inst, viewer_uid) -> str:
+    """Row versions that determine the card document for this viewer."""
+    tpl = inst.template
+    return make_etag(
+        'card', inst.id, inst.serial_no, inst.status, inst.owner_user_id, viewer_uid,
+        tpl.id, tpl.version, tpl.glb_url, tpl.image_url,
+        tpl.athlete_id, athlete_version(tpl.athlete),
+    )
 
 @bp.get('/<uuid:card_id>')
 def get_card(card_id):
-    inst = db.session.get(CardInstance, card_id)
+    inst = load_card(card_id, profile=False)
     if not inst: return jsonify({'error':'not found'}), 404
-    tpl = db.session.get(CardTemplate, inst.template_id)
-    ath = db.session.get(Athlete, tpl.athlete_id)
-    
-    uid = _uuid(session.get('uid'))
-    owned_by_me = bool(inst.owner_user_id) and uid and str(inst.owner_user_id) == str(uid)
+    uid = current_user_id()
+    etag = card_etag(inst, uid)
+    cached = not_modified(etag)
+    if cached: return cached
     
+    return with_etag(jsonify(card_json(inst, uid)), etag)
+
+def card_json(inst, viewer_uid) -> dict:
+    """The GET /api/cards/<id> document for this viewer."""
+    tpl = inst.template
+    ath = tpl.athlete
+    owned_by_me = bool(inst.owner_user_id) and bool(viewer_uid) and str(inst.owner_user_id) == str(viewer_uid)
+
     # Construct card image URL based on version (regular or diamond)
     card_image_url = ath.card_image_url
     if card_image_url and not card_image_url.endswith('.png'):
@@ -37,7 +147,7 @@ def get_card(card_id):
         suffix = '-DIA.png' if tpl.version == 'diamond' else '-REG.png'
         card_image_url = card_image_url + suffix
     
-    return jsonify({
+    return {
         'id': str(inst.id), 
         'owned': bool(inst.owner_user_id), 
         'ownedByMe': owned_by_me, 
@@ -47,86 +157,48 @@ def get_card(card_id):
             'version': tpl.version,
             'glb_url': tpl.glb_url,
             'image_url': tpl.image_url,
-                'athlete': {
-                'full_name': ath.full_name,
-                'series_number': ath.series_number,
-                'card_number': ath.card_number,
-                'dob': ath.dob.isoformat() if ath.dob else None,
-                'sport': ath.sport,
-                'discipline': ath.discipline.value if hasattr(ath.discipline, 'value') else ath.discipline,
-                'nationality': ath.nationality,
-                'hometown': ath.hometown,
-                'handedness': ath.handedness.value if hasattr(ath.handedness, 'value') else ath.handedness,
-                'world_ranking': ath.world_ranking,
-                'best_world_ranking': ath.best_world_ranking,
-                'intl_debut_year': ath.intl_debut_year,
-                'bio_short': ath.bio_short,
-                'bio_long': ath.bio_long,
-                'quote_text': ath.quote_text,
-                'quote_source': ath.quote_source,
-                'card_image_url': card_image_url,
-                'card_back_url': ath.card_back_url,
-                'hero_image_url': ath.hero_image_url,
-                'video_url': ath.video_url,
-                'quote_photo_url': ath.quote_photo_url,
-                'action_photo_url': ath.action_photo_url,
-                'qualification_image_url': ath.qualification_image_url,
-                'achievements': [
-                    {
-                        'title': ach.title,
-                        'result': ach.result,
-                        'medal': ach.medal.value if hasattr(ach.medal, 'value') else ach.medal,
-                        'display_order': ach.display_order,
-                        'notes': ach.notes
-                    }
-                    for ach in ath.achievements
-                ],
-                'equipment': [
-                    {
-                        'category': eq.category,
-                        'brand': eq.brand,
-                        'model': eq.model,
-                        'display_order': eq.display_order
-                    }
-                    for eq in ath.equipment
-                ],
-                'qualifications': [
-                    {
-                        'year': qual.year,
-                        'score': float(qual.score) if qual.score else None,
-                        'event': qual.event
-                    }
-                    for qual in ath.qualifications
-                ],
-                'stats': {
-                    'win_percentage': float(ath.stats.win_percentage) if ath.stats and ath.stats.win_percentage else None,
-                    'average_arrow': float(ath.stats.average_arrow) if ath.stats and ath.stats.average_arrow else None,
-                    'tiebreak_win_rate': float(ath.stats.tiebreak_win_rate) if ath.stats and ath.stats.tiebreak_win_rate else None,
-                    'extras': ath.stats.extras if ath.stats and ath.stats.extras else {}
-                },
-                'socials': ath.socials or {},
-                'sponsors': ath.sponsors or []
-            }
+            # the cached doc is shared; copy before overriding the per-version image
+            'athlete': {**cached_athlete_json(ath), 'card_image_url': card_image_url},
         }
-    })
+    }
+
+# ---------------- scan/verify response includes ----------------
+SCAN_INCLUDES = ('card', 'viewer')
+
+def requested_includes() -> set:
+    """The ?include=card,viewer parts a scan/verify caller asked for."""
+    raw = request.args.get('include') or ''
+    return {part.strip() for part in raw.split(',')} & set(SCAN_INCLUDES)
+
+def scan_includes(inst, includes: set) -> dict:
+    """
+    Extra scan-response fields so the landing page can render without
+    calling /api/cards/<id> and /api/auth/me afterwards:
+      card    the same document as GET /api/cards/<id>
+      viewer  who is looking and whether they own or can claim the card
+
+    Call before committing: a commit expires ``inst`` and its eager-loaded
+    template/athlete, which would cost a reload per relationship.
+    """
+    out = {}
+    if not includes:
+        return out
+    uid = current_user_id()
+    if 'card' in includes:
+        out['card'] = card_json(inst, uid)
+    if 'viewer' in includes:
+        user = current_user() if uid else None
+        out['viewer'] = {
+            'authenticated': user is not None,
+            'ownedByMe': bool(inst.owner_user_id) and bool(uid) and str(inst.owner_user_id) == str(uid),
+            'canClaim': not inst.owner_user_id,
+            'user': user_json(user) if user else None,
+        }
+    return out
 
 @bp.post('/<uuid:card_id>/claim')
 def claim(card_id):
-    # Try auth token from query parameter first (for Safari mobile compatibility)
-    auth_token = request.args.get('auth_token')
-    uid = None
-    
-    if auth_token:
-        user_id = _verify_auth_token(auth_token)
-        if user_id:
-            uid = _uuid(user_id)
-            print(f"✅ Card claim: User found via auth token: {user_id}")
-    
-    # Fallback to session-based authentication
-    if not uid:
-        uid = _uuid(session.get('uid'))
-        if uid:
-            print(f"✅ Card claim: User found via session")
+    uid = current_user_id()
     
     if not uid:
         print(f"❌ Card claim: No authentication found")
@@ -1,79 +1,107 @@
 # backend/routes_collection.py
 from flask import Blueprint, jsonify, session, request
 from models import db, CardInstance, CardTemplate, Athlete, User
+from athlete_cache import athlete_version
 from sqlalchemy.orm import joinedload
-from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-from flask import current_app
+from etags import make_etag, not_modified, with_etag
+from auth import current_user_id
+import keyset
 import uuid as uuidlib
 
 bp = Blueprint('collection', __name__, url_prefix='/api/collection')
 
+# Keyset pagination on (created_at DESC, id DESC); see keyset.py
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+FIELDS = ('id', 'serial_no', 'status', 'created_at', 'template', 'athlete')
+
 def _uuid(val):
     try: return uuidlib.UUID(str(val))
     except Exception: return None
 
-def _verify_auth_token(token):
-    """Verify and extract user ID from auth token"""
-    try:
-        serializer = URLSafeTimedSerializer(current_app.secret_key)
-        user_id = serializer.loads(token, salt=current_app.config.get('AUTH_TOKEN_SALT', 'auth-token'), max_age=3600)  # 1 hour expiry
-        return user_id
-    except (BadSignature, SignatureExpired):
-        return None
+def _parse_fields(raw):
+    """Requested top-level item keys; all of them when fields= is absent, None if invalid."""
+    if not raw:
+        return set(FIELDS)
+    fields = {f.strip() for f in raw.split(',') if f.strip()}
+    return fields if fields and fields <= set(FIELDS) else None
+
+def _card_item(ci, fields):
+    item = {}
+    if 'id' in fields:
+        item['id'] = str(ci.id)
+    if 'serial_no' in fields:
+        item['serial_no'] = ci.serial_no
+    if 'status' in fields:
+        item['status'] = ci.status.value if hasattr(ci.status, 'value') else str(ci.status)
+    if 'created_at' in fields:
+        item['created_at'] = ci.created_at.isoformat() if ci.created_at else None
+    tmpl = ci.template if fields & {'template', 'athlete'} else None
+    if 'template' in fields:
+        item['template'] = {
+            'version': getattr(tmpl, 'version', None),
+            'image_url': getattr(tmpl, 'image_url', None),
+            'glb_url': getattr(tmpl, 'glb_url', None),
+        }
+    if 'athlete' in fields:
+        ath = tmpl.athlete if tmpl else None
+        item['athlete'] = {
+            'id': str(getattr(ath, 'id', '')),
+            'full_name': getattr(ath, 'full_name', ''),
+            'slug': getattr(ath, 'slug', ''),
+            'card_image_url': getattr(ath, 'card_image_url', None),
+            'card_number': getattr(ath, 'card_number', None),
+            'series_number': getattr(ath, 'series_number', None),
+        }
+    return item
+
+def _page_etag(uid, cursor, limit, fields, rows):
+    """Versions of exactly the rows this page serializes (plus the look-ahead row behind next_cursor)."""
+    parts = ['collection', uid, cursor, limit, ','.join(sorted(fields))]
+    for ci in rows:
+        parts += [ci.id, ci.status]
+        if fields & {'template', 'athlete'}:
+            tmpl = ci.template
+            parts += [tmpl.version, tmpl.image_url, tmpl.glb_url]
+            if 'athlete' in fields:
+                parts.append(athlete_version(tmpl.athlete))
+    return make_etag(*parts)
 
 @bp.get('')
 def my_collection():
-    # Try auth token from query parameter first (for Safari mobile compatibility)
-    auth_token = request.args.get('auth_token')
-    uid = None
-    
-    if auth_token:
-        user_id = _verify_auth_token(auth_token)
-        if user_id:
-            uid = _uuid(user_id)
-    
-    # Fallback to session-based authentication
-    if not uid:
-        uid = _uuid(session.get('uid'))
-    
+    uid = current_user_id()
     if not uid:
         return jsonify({'error':'unauthorized'}), 401
 
-    rows = (
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'invalid_limit'}), 400
+    cursor = request.args.get('cursor') or None
+    position = keyset.decode_cursor(cursor) if cursor else None
+    if cursor and position is None:
+        return jsonify({'error': 'invalid_cursor'}), 400
+    fields = _parse_fields(request.args.get('fields'))
+    if fields is None:
+        return jsonify({'error': 'invalid_fields', 'allowed': list(FIELDS)}), 400
+
+    q = (
         db.session.query(CardInstance)
-        .options(
-            joinedload(CardInstance.template),
-            joinedload(CardInstance.template).joinedload(CardTemplate.athlete),
-            # if you have a direct relationship, adjust accordingly
-        )
-        .join(CardTemplate, CardTemplate.id == CardInstance.template_id)
-        .join(Athlete, Athlete.id == CardTemplate.athlete_id)
         .filter(CardInstance.owner_user_id == uid)
-        .order_by(CardInstance.created_at.desc())
-        .all()
+        .order_by(CardInstance.created_at.desc(), CardInstance.id.desc())
     )
+    if fields & {'template', 'athlete'}:
+        q = q.options(joinedload(CardInstance.template).joinedload(CardTemplate.athlete))
+    if position:
+        # Row-value comparison: walks ix_card_instances_owner_created_id from the cursor
+        q = q.filter(keyset.after(CardInstance.created_at, CardInstance.id, position, descending=True))
+    rows = q.limit(limit + 1).all()
 
-    items = []
-    for ci in rows:
-        tmpl = ci.template
-        ath = tmpl.athlete if tmpl else None
-        items.append({
-            'id': str(ci.id),
-            'serial_no': ci.serial_no,
-            'status': ci.status.value if hasattr(ci.status, 'value') else str(ci.status),
-            'template': {
-                'version': getattr(tmpl, 'version', None),
-                'image_url': getattr(tmpl, 'image_url', None),
-                'glb_url': getattr(tmpl, 'glb_url', None),
-            },
-            'athlete': {
-                'id': str(getattr(ath, 'id', '')),
-                'full_name': getattr(ath, 'full_name', ''),
-                'slug': getattr(ath, 'slug', ''),
-                'card_image_url': getattr(ath, 'card_image_url', None),
-                'card_number': getattr(ath, 'card_number', None),
-                'series_number': getattr(ath, 'series_number', None),
-            }
-        })
+    # O(page): the tag comes from the rows just read, so a 304 only skips serialization
+    etag = _page_etag(uid, cursor, limit, fields, rows)
+    cached = not_modified(etag)
+    if cached: return cached
 
-    return jsonify({'items': items})
+    next_cursor = keyset.encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    items = [_card_item(ci, fields) for ci in rows[:limit]]
+    return with_etag(jsonify({'items': items, 'next_cursor': next_cursor}), etag)
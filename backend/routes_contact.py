@@ -1,6 +1,6 @@
 # backend/routes_contact.py
 from flask import Blueprint, request, jsonify
-from mailer import send_email
+from mail_queue import enqueue_email
 
 bp = Blueprint("contact", __name__, url_prefix="/api")
 
@@ -43,8 +43,8 @@ Message:
 {message}
         """
         
-        # Send email
-        send_email(
+        # Queue the email; the background sender delivers it
+        enqueue_email(
             to="support@titansportshq.com",
             subject=subject,
             html=html_content,
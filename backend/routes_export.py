@@ -0,0 +1,196 @@
+# backend/routes_export.py
+"""
+Admin bulk exports, streamed as CSV or NDJSON in constant memory.
+
+  GET /api/admin/export/instances   one row per CardInstance + template, athlete, owner, last scan
+  GET /api/admin/export/scans       one row per ScanEvent
+
+Query params (all optional):
+  format=csv|ndjson      default csv
+  template=<hint>        UUID, template_code or ETRNL group id
+  series=<n>             athlete series number
+  since=, until=         ISO date/datetime bounds on created_at (since inclusive, until exclusive)
+  after=<cursor>         resume after a previous export's last row
+  limit=<n>              stop after n rows
+
+Rows come oldest first, in (created_at, id) order, read through a server-side
+cursor (stream_results / yield_per) and written out in chunks. Every row
+carries a ``cursor`` column. If a long export is cut off, pass the last
+received cursor back as ``after=`` to continue where it stopped.
+"""
+import csv
+import enum
+import io
+import json
+import uuid
+from datetime import date, datetime, timezone
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import select
+
+import keyset
+from models import db, Athlete, CardTemplate, CardInstance, ScanEvent, User
+from routes_admin import require_admin
+from template_index import find_template
+
+bp = Blueprint("export_api", __name__, url_prefix="/api/admin/export")
+
+YIELD_PER = 1000
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_when(raw: str | None) -> datetime | None:
+    if not raw:
+        return None
+    try:
+        when = datetime.fromisoformat(raw)
+    except ValueError:
+        raise ExportError(f"invalid date: {raw}")
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def _filters(created_col, id_col, template_col, athlete_join_col):
+    """WHERE clauses shared by both exports, from the query string."""
+    where = []
+    if request.args.get("template"):
+        tpl = find_template(request.args["template"])
+        if not tpl:
+            raise ExportError("unknown template")
+        where.append(template_col == tpl.id)
+    if request.args.get("series"):
+        try:
+            series = int(request.args["series"])
+        except ValueError:
+            raise ExportError("series must be an integer")
+        where.append(athlete_join_col.in_(select(Athlete.id).where(Athlete.series_number == series)))
+    since, until = _parse_when(request.args.get("since")), _parse_when(request.args.get("until"))
+    if since:
+        where.append(created_col >= since)
+    if until:
+        where.append(created_col < until)
+    if request.args.get("after"):
+        position = keyset.decode_cursor(request.args["after"])
+        if position is None:
+            raise ExportError("invalid cursor")
+        where.append(keyset.after(created_col, id_col, position))
+    return where
+
+
+def _limit() -> int | None:
+    raw = request.args.get("limit")
+    if not raw:
+        return None
+    try:
+        return max(int(raw), 1)
+    except ValueError:
+        raise ExportError("limit must be an integer")
+
+
+def _value(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    if isinstance(v, enum.Enum):
+        return v.value
+    return v
+
+
+def _stream(stmt, columns: list[str], fmt: str):
+    """Yield the export body in chunks of YIELD_PER rows."""
+    result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=YIELD_PER))
+    header = columns + ["cursor"]
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(header)
+    for partition in result.partitions():
+        for row in partition:
+            values = [_value(v) for v in row] + [keyset.encode_cursor(row.created_at, row.id)]
+            if writer:
+                writer.writerow(["" if v is None else v for v in values])
+            else:
+                buf.write(json.dumps(dict(zip(header, values))) + "\n")
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if writer and buf.tell():
+        yield buf.getvalue()
+
+
+def _respond(stmt, columns: list[str], name: str):
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        raise ExportError("format must be csv or ndjson")
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return Response(
+        stream_with_context(_stream(stmt, columns, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{name}-{stamp}.{fmt}"',
+                 "X-Accel-Buffering": "no"},
+    )
+
+
+@bp.errorhandler(ExportError)
+def _bad_request(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@bp.get("/instances")
+@require_admin
+def export_instances():
+    ci, t, a = CardInstance, CardTemplate, Athlete
+    scans = ScanEvent
+    # Correlated lookups of each instance's newest scan; both walk ix_scans_card_instance_id_created_at
+    last_scan = (
+        select(scans.created_at, scans.authentic)
+        .where(scans.card_instance_id == ci.id)
+        .order_by(scans.created_at.desc())
+        .limit(1)
+    )
+    columns = {
+        "id": ci.id, "created_at": ci.created_at, "serial_no": ci.serial_no, "status": ci.status,
+        "etrnl_tag_uid": ci.etrnl_tag_uid, "etrnl_tag_id": ci.etrnl_tag_id, "last_ctr": ci.last_ctr,
+        "template_id": t.id, "template_code": t.template_code, "version": t.version,
+        "athlete_id": a.id, "athlete_name": a.full_name, "series_number": a.series_number,
+        "card_number": a.card_number, "owner_user_id": ci.owner_user_id, "owner_email": User.email,
+        "last_scan_at": last_scan.with_only_columns(scans.created_at).scalar_subquery(),
+        "last_scan_authentic": last_scan.with_only_columns(scans.authentic).scalar_subquery(),
+    }
+    stmt = (
+        select(*[col.label(name) for name, col in columns.items()])
+        .select_from(ci)
+        .join(t, t.id == ci.template_id)
+        .join(a, a.id == t.athlete_id)
+        .outerjoin(User, User.id == ci.owner_user_id)
+        .where(*_filters(ci.created_at, ci.id, ci.template_id, t.athlete_id))
+        .order_by(ci.created_at, ci.id)
+        .limit(_limit())
+    )
+    return _respond(stmt, list(columns), "card-instances")
+
+
+@bp.get("/scans")
+@require_admin
+def export_scans():
+    s, ci, t = ScanEvent, CardInstance, CardTemplate
+    columns = {
+        "id": s.id, "created_at": s.created_at, "card_instance_id": s.card_instance_id,
+        "template_id": ci.template_id, "tag_id": s.tag_id, "uid": s.uid, "ctr": s.ctr,
+        "authentic": s.authentic, "tt_curr": s.tt_curr, "tt_perm": s.tt_perm, "ip": s.ip,
+        "user_agent": s.user_agent,
+    }
+    stmt = (
+        select(*[col.label(name) for name, col in columns.items()])
+        .select_from(s)
+        .outerjoin(ci, ci.id == s.card_instance_id)
+        .outerjoin(t, t.id == ci.template_id)
+        .where(*_filters(s.created_at, s.id, ci.template_id, t.athlete_id))
+        .order_by(s.created_at, s.id)
+        .limit(_limit())
+    )
+    return _respond(stmt, list(columns), "scans")
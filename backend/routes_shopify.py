@@ -1,6 +1,8 @@
 from flask import Blueprint, request, abort
 import hmac, hashlib, base64, os
 
+from shopify_ingest import record_webhook
+
 bp = Blueprint('shopify_webhooks', __name__, url_prefix='/webhooks/shopify')
 SHARED_SECRET = os.environ.get('SHOPIFY_WEBHOOK_SECRET','')
 
@@ -12,5 +14,14 @@ def verify_hmac(req):
 @bp.post('/orders_create')
 def orders_create():
     if not verify_hmac(request): abort(401)
-    # TODO: store order payload, link to cart attributes
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict): abort(400)
+    # Ack as soon as the raw event is durable; shopify_ingest turns it into orders/line items
+    record_webhook(
+        request.headers.get('X-Shopify-Webhook-Id'),
+        request.headers.get('X-Shopify-Topic', 'orders/create'),
+        request.headers.get('X-Shopify-Shop-Domain'),
+        payload,
+        request.get_data(),
+    )
     return ('',200)
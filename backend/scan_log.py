@@ -0,0 +1,132 @@
+# backend/scan_log.py
+"""
+Write-behind buffer for ScanEvent audit rows.
+
+Scan handlers call ``log_scan(...)`` where they used to ``db.session.add(ScanEvent(...))``.
+The row is handed to the buffer only once the request's transaction commits
+(so a freshly minted instance exists before its scan row references it) and
+is dropped on rollback. A background thread writes buffered rows with one
+executemany INSERT when SCAN_LOG_BATCH rows are waiting or every
+SCAN_LOG_INTERVAL seconds, and drains the buffer on worker shutdown
+(gunicorn's worker_exit hook, and atexit). Rows are never dropped: once
+SCAN_LOG_MAX_PENDING rows are waiting, new ones are written in the request.
+
+SCAN_LOG_MODE=sync keeps the old behaviour: the row joins the request's transaction.
+"""
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from background import BackgroundWorker
+from models import db, ScanEvent
+
+_PENDING_KEY = "scan_log_pending"
+_COLUMNS = [c.name for c in ScanEvent.__table__.columns]
+
+
+class ScanLogWriter(BackgroundWorker):
+    def __init__(self, batch_size: int = 200, interval: float = 1.0, max_pending: int = 50000):
+        super().__init__("scan-log-writer", interval)
+        self.app = None
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "written_inline": 0, "flushes": 0, "errors": 0}
+
+    def add(self, rows: list[dict]):
+        self.ensure_started()
+        with self._lock:
+            backlogged = len(self._rows) >= self.max_pending
+            if not backlogged:
+                self._rows.extend(rows)
+                self.stats["enqueued"] += len(rows)
+                full = len(self._rows) >= self.batch_size
+        if backlogged:
+            # The writer is falling behind: write in the request rather than lose audit rows
+            self._write_inline(rows)
+        elif full:
+            self.wake()
+
+    def _write_inline(self, rows: list[dict]):
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(ScanEvent.__table__), rows)
+        except Exception as e:
+            # Database trouble: keep them for the writer, over the cap if need be
+            with self._lock:
+                self._rows.extend(rows)
+                self.stats["enqueued"] += len(rows)
+                self.stats["errors"] += 1
+            print(f"❌ Scan log inline write failed ({len(rows)} rows): {e}")
+            return
+        with self._lock:
+            self.stats["written"] += len(rows)
+            self.stats["written_inline"] += len(rows)
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def tick(self):
+        while True:
+            with self._lock:
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            if not batch:
+                return
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(ScanEvent.__table__), batch)
+            except Exception as e:
+                # Put the batch back and retry on the next tick
+                with self._lock:
+                    self._rows.extendleft(reversed(batch))
+                    self.stats["errors"] += 1
+                print(f"❌ Scan log flush failed ({len(batch)} rows): {e}")
+                return
+            with self._lock:
+                self.stats["written"] += len(batch)
+                self.stats["flushes"] += 1
+
+
+writer = ScanLogWriter()
+_mode = os.getenv("SCAN_LOG_MODE", "buffered")
+
+
+def init_scan_log(app):
+    global _mode
+    _mode = app.config.get("SCAN_LOG_MODE", os.getenv("SCAN_LOG_MODE", "buffered"))
+    writer.app = app
+    writer.batch_size = int(os.getenv("SCAN_LOG_BATCH", str(writer.batch_size)))
+    writer.interval = float(os.getenv("SCAN_LOG_INTERVAL", str(writer.interval)))
+    writer.max_pending = int(os.getenv("SCAN_LOG_MAX_PENDING", str(writer.max_pending)))
+
+
+def log_scan(**fields):
+    """Record a ScanEvent; takes the same keyword arguments as the model."""
+    # created_at is part of the (partitioned) primary key, so stamp it client-side
+    fields.setdefault("created_at", datetime.now(timezone.utc))
+    if _mode == "sync" or writer.app is None:
+        db.session.add(ScanEvent(**fields))
+        return
+    # executemany needs every row to carry the same keys
+    row = dict.fromkeys(_COLUMNS)
+    row.update(fields, id=fields.get("id") or uuid.uuid4())
+    db.session.info.setdefault(_PENDING_KEY, []).append(row)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed_scans(session):
+    rows = session.info.pop(_PENDING_KEY, None)
+    if rows:
+        writer.add(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_scans(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,164 @@
+# backend/scan_pipeline.py
+"""
+The one scan path: verify a tag with a backend from verification_backends,
+then re-scan or mint its card.
+
+  1. find the template from the hint (in memory; it also names the tag's key batch)
+  2. pick the backend from the request parameters (registry.select)
+  3. coalesce concurrent scans of the tag (SingleFlight; identical requests share a result)
+  4. verify, then look the card up by the backend's identity column; for SUN
+     tags, the decrypted UID must belong to the tagId the request named
+  5. re-scan: replay check on the read counter (when the tag has one) and log
+     first sighting: advisory lock + re-check, mint, log
+
+GET /api/scan accepts any backend's parameters. The older endpoints
+(/api/scan/resolve, /api/verification/verify, ...) run the same pipeline
+restricted to their backends.
+"""
+from flask import jsonify, request
+from sqlalchemy import select
+from models import db, CardInstance
+from minting import mint_instance, EditionCapReached
+import replay_counters
+from routes_cards import SCAN_INCLUDES, card_load_options, load_card, requested_includes, scan_includes
+from scan_log import log_scan
+from singleflight import SingleFlight, advisory_xact_lock
+from template_index import find_template
+from verification_backends import registry
+import os, requests, time, uuid
+
+SUN_BACKENDS = ('sun_local', 'etrnl')
+
+# Concurrent scans of one tag run one at a time; an identical request shares the result
+scan_flights = SingleFlight(timeout=float(os.environ.get('SCAN_SINGLEFLIGHT_TIMEOUT', '30')))
+
+
+def resolve(params=None, template_hint=None, tag_id_hint=None, only=None):
+    """Flask response for a scan; ``only`` restricts the backends (legacy endpoints)."""
+    body, status = run(params, template_hint, tag_id_hint, only)
+    return jsonify(body), status
+
+
+def run(params=None, template_hint=None, tag_id_hint=None, only=None) -> tuple[dict, int]:
+    params = request.args if params is None else params
+    template_hint = template_hint or params.get('t') or params.get('template') or params.get('templateId')
+    template = find_template(template_hint)
+
+    backend, claim = registry.select(params, template, template_hint, tag_id_hint, only)
+    if claim is None:
+        return {'ok': False, 'reason': 'missing_params',
+                'need': ' | '.join(dict.fromkeys(b.need for b in registry.backends(only)))}, 400
+    if backend is None:
+        # Understood, but no backend may verify it (e.g. no key in SUN_VERIFY_MODE=local)
+        return {'ok': False, 'reason': 'not_authentic'}, 400
+
+    started = time.perf_counter()
+    includes = requested_includes()
+    (body, status), shared = scan_flights.do(
+        claim.tag_id, lambda: _resolve_tag(backend, claim, template, includes), token=claim.token,
+    )
+    if shared:
+        # The leader's card/viewer parts were for its viewer
+        body = {k: v for k, v in body.items() if k not in SCAN_INCLUDES}
+        if includes and body.get('ok'):
+            body.update(scan_includes(load_card(uuid.UUID(body['cardId']), profile=False), includes))
+    outcome = body.get('reason') or ('minted' if body.get('minted') else 'rescan')
+    registry.observe_scan(backend.name, time.perf_counter() - started, outcome)
+    return {**body, **claim.response, 'verification_service': backend.name}, status
+
+
+def _find_instance(column: str, value, includes):
+    # with ?include=card, the same query loads what the card needs
+    stmt = select(CardInstance).where(getattr(CardInstance, column) == value)
+    if 'card' in includes:
+        stmt = stmt.options(*card_load_options(profile=False))
+    return db.session.execute(stmt).scalar_one_or_none()
+
+
+def _tag_mismatch(inst, tag_id, uid) -> bool:
+    """
+    SUN keys are picked by the client's tagId, so a valid tap could be replayed
+    under another tagId. The UID decrypted from the message decides: its card
+    must carry this tagId, and no other card may.
+    """
+    if inst is not None:
+        return bool(inst.etrnl_tag_id) and inst.etrnl_tag_id != tag_id
+    return db.session.scalar(select(CardInstance.id).where(CardInstance.etrnl_tag_id == tag_id).limit(1)) is not None
+
+
+def _resolve_tag(backend, claim, template, includes) -> tuple[dict, int]:
+    """Verify, then re-scan or mint. Returns (body, status) so concurrent callers can share it."""
+    started = time.perf_counter()
+    try:
+        verdict = backend.verify(claim, template)
+    except requests.RequestException as e:
+        registry.observe_verify(backend.name, time.perf_counter() - started, ok=False)
+        return {'ok': False, 'reason': backend.error_reason, 'error': str(e)}, 502
+    registry.observe_verify(backend.name, time.perf_counter() - started, ok=True)
+
+    if not verdict.authentic:
+        return {'ok': False, 'reason': 'not_authentic'}, backend.reject_status
+
+    tag_id, uid = claim.tag_id, verdict.uid
+    ctr = verdict.ctr if verdict.ctr is not None else 1
+    identity = tag_id if backend.match_column == 'etrnl_tag_id' else uid
+    scan = dict(
+        tag_id=tag_id, uid=uid, ctr=ctr,
+        authentic=True,
+        ip=request.remote_addr,
+        user_agent=request.headers.get('User-Agent'),
+        tt_curr=verdict.tt_curr,
+        tt_perm=verdict.tt_perm,
+    )
+
+    # Existing card for this tag?
+    inst = _find_instance(backend.match_column, identity, includes)
+    if inst is None and advisory_xact_lock(db.session, f"tag-uid:{identity}"):
+        # Another worker may have minted it while we waited for the lock
+        inst = _find_instance(backend.match_column, identity, includes)
+
+    if backend.match_column == 'etrnl_tag_uid' and _tag_mismatch(inst, tag_id, uid):
+        db.session.rollback()
+        print(f"⚠️ SUN message for uid={uid} presented under tagId={tag_id}")
+        return {'ok': False, 'reason': 'tag_mismatch'}, backend.reject_status
+
+    if inst:
+        # replay protection: one compare-and-set on last_ctr (see replay_counters)
+        if verdict.ctr is not None and not replay_counters.advance(inst.id, ctr, known=inst.last_ctr or 0):
+            db.session.rollback()
+            return {'ok': False, 'reason': 'replay'}, 409
+
+        # Read everything the response needs before commit expires inst
+        state = 'unclaimed' if not inst.owner_user_id else 'owned_by_other'
+        card_id = str(inst.id)
+        extra = scan_includes(inst, includes)
+        log_scan(card_instance_id=inst.id, **scan)
+        db.session.commit()
+
+        # 🔹 minted=False for subsequent scans
+        return {'ok': True, 'state': state, 'cardId': card_id, 'minted': False, **extra}, 200
+
+    # First sighting → needs a template
+    if not template:
+        db.session.rollback()
+        return {'ok': False, 'reason': 'unknown_template', 'hint': claim.template_hint}, 404
+
+    # Mint + log scan (serial allocation and insert are one statement)
+    try:
+        inst_id, serial_no = mint_instance(template.id, tag_uid=uid, tag_id=tag_id, last_ctr=ctr)
+        log_scan(card_instance_id=inst_id, **scan)
+        db.session.commit()
+    except EditionCapReached:
+        db.session.rollback()
+        return {'ok': False, 'reason': 'edition_cap_reached'}, 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Mint failed for tag {tag_id} ({backend.name}): {e}")
+        return {'ok': False, 'reason': 'mint_failed', 'error': str(e)}, 500
+
+    if verdict.ctr is not None:
+        replay_counters.note_minted(inst_id, ctr)
+    extra = scan_includes(load_card(inst_id, profile=False), includes) if includes else {}
+    # 🔹 minted=True for first-ever scan (warehouse registration)
+    return {'ok': True, 'state': 'unclaimed', 'cardId': str(inst_id), 'minted': True,
+            'serial_no': serial_no, **extra}, 200
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark password hash methods on this machine to pick PASSWORD_HASH_METHOD.
+
+Reports, per method: time per hash, hashes/s on one core, and hashes/s with
+--threads concurrent hashes (hashlib releases the GIL, so this should scale to
+the core count).
+
+Usage (run from backend/ folder, venv active):
+
+  python scripts/bench_password_hash.py
+  python scripts/bench_password_hash.py --method pbkdf2:sha256:1000000 --method scrypt:32768:8:1
+  python scripts/bench_password_hash.py --threads 4 --rounds 40
+
+Rule of thumb: pick the strongest setting that keeps a single hash around
+100-250 ms on the production dyno.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from passwords import DEFAULT_METHOD
+
+DEFAULT_METHODS = [
+    "pbkdf2:sha256:260000",
+    DEFAULT_METHOD,
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+]
+
+
+def bench(method: str, rounds: int, threads: int) -> tuple[float, float, float]:
+    generate_password_hash("warm-up", method=method)
+
+    started = time.perf_counter()
+    for i in range(rounds):
+        generate_password_hash(f"password-{i}", method=method)
+    single = (time.perf_counter() - started) / rounds
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: generate_password_hash(f"password-{i}", method=method), range(rounds)))
+    parallel = rounds / (time.perf_counter() - started)
+    return single, 1 / single, parallel
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark werkzeug password hash methods")
+    p.add_argument("--method", action="append", help="werkzeug method string (repeatable)")
+    p.add_argument("--rounds", type=int, default=10, help="hashes per measurement (default 10)")
+    p.add_argument("--threads", type=int, default=os.cpu_count() or 1,
+                   help="concurrent hashes for the parallel run (default: CPU count)")
+    args = p.parse_args()
+
+    print(f"🖥️  {os.cpu_count()} CPUs, {args.threads} threads, {args.rounds} rounds\n")
+    print(f"{'method':<26} {'ms/hash':>9} {'hash/s/core':>12} {'hash/s total':>13}")
+    for method in args.method or DEFAULT_METHODS:
+        single, per_core, parallel = bench(method, args.rounds, args.threads)
+        print(f"{method:<26} {single * 1000:>9.1f} {per_core:>12.1f} {parallel:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start: import time, app construction and first-request latency.
+
+Each run is a fresh interpreter (nothing warm in sys.modules) that measures:
+  import     ``import app`` (the module alone; the full app is built lazily)
+  create     create_app(minimal=True) or create_app()
+  first_req  first GET through the test client (full app only)
+  total      interpreter start to the end of the above, as seen by this script
+
+Usage (run from backend/ folder, venv active):
+
+  python scripts/bench_startup.py
+  python scripts/bench_startup.py --runs 10 --path /api/athletes
+  python scripts/bench_startup.py --importtime      # top imports by cumulative time
+
+Point DATABASE_URL at a real database to include the template-index build in
+the full app's create time.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as appmod
+t1 = time.perf_counter()
+app = appmod.create_app(minimal={minimal})
+t2 = time.perf_counter()
+first = None
+if not {minimal}:
+    status = app.test_client().get({path!r}).status_code
+    first = time.perf_counter() - t2
+out = {{"import": t1 - t0, "create": t2 - t1, "first_req": first, "modules": len(sys.modules)}}
+sys.stderr.flush()
+print("BENCH " + json.dumps(out))
+"""
+
+
+def probe(minimal: bool, path: str) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(minimal=minimal, path=path)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    total = time.perf_counter() - started
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("BENCH ")), None)
+    if proc.returncode or not line:
+        raise SystemExit(f"❌ probe failed:\n{proc.stdout}\n{proc.stderr}")
+    out = json.loads(line[len("BENCH "):])
+    out["total"] = total
+    return out
+
+
+def importtime(minimal: bool, top: int):
+    code = f"import app; app.create_app(minimal={minimal})"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    print(f"\n🐢 slowest imports ({'minimal' if minimal else 'full'} app, cumulative):")
+    for us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Cold-start benchmark for the minimal and full app")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--path", default="/health", help="first request path for the full app (default /health)")
+    p.add_argument("--importtime", action="store_true", help="also list the slowest imports")
+    p.add_argument("--top", type=int, default=15)
+    args = p.parse_args()
+
+    def ms(values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return "      -"
+        return f"{statistics.median(values) * 1000:7.1f}"
+
+    print(f"🚀 {args.runs} cold starts each (median ms)")
+    print(f"{'app':<8} {'import':>7} {'create':>7} {'1st req':>7} {'total':>7} {'modules':>7}")
+    for minimal in (True, False):
+        runs = [probe(minimal, args.path) for _ in range(args.runs)]
+        print(f"{'minimal' if minimal else 'full':<8} {ms([r['import'] for r in runs])} "
+              f"{ms([r['create'] for r in runs])} {ms([r['first_req'] for r in runs])} "
+              f"{ms([r['total'] for r in runs])} {runs[-1]['modules']:>7}")
+
+    if args.importtime:
+        importtime(True, args.top)
+        importtime(False, args.top)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
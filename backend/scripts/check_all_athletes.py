@@ -4,7 +4,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 from models import Athlete, CardTemplate, AthleteAchievement, AthleteQualification
 from sqlalchemy import text
 
@@ -7,7 +7,8 @@ from datetime import datetime
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 from models import db, CardInstance, CardTemplate, Athlete
 
 def check_card_images():
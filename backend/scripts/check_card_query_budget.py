@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Regression check: GET /api/cards/<id> must stay within CARD_QUERY_BUDGET SQL statements.
+
+Usage (run from backend/ folder, venv active):
+
+  # Check the most recently minted card
+  python scripts/check_card_query_budget.py
+
+  # Check a specific card instance
+  python scripts/check_card_query_budget.py --card-id 6c7f7d1b-2d05-4b3e-9f8f-886f0b1e61f2
+
+Exits non-zero when the endpoint goes over budget, so it can gate a deploy.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import app
+from athlete_cache import cache as athlete_cache
+from models import db, CardInstance
+from routes_cards import CARD_QUERY_BUDGET
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check the SQL statement budget of GET /api/cards/<id>")
+    p.add_argument("--card-id", help="CardInstance.id (UUID); defaults to the newest card")
+    p.add_argument("--budget", type=int, default=CARD_QUERY_BUDGET,
+                   help=f"max statements allowed (default {CARD_QUERY_BUDGET})")
+    args = p.parse_args()
+
+    with app.app_context():
+        card_id = args.card_id
+        if not card_id:
+            last = CardInstance.query.order_by(CardInstance.created_at.desc()).first()
+            if not last:
+                print("No card instances found in database")
+                return 1
+            card_id = str(last.id)
+        # Measure the worst case: clean identity map and a cold athlete cache
+        db.session.remove()
+        athlete_cache.clear()
+
+        statements = []
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _count)
+        try:
+            resp = app.test_client().get(f"/api/cards/{card_id}")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _count)
+
+    print(f"GET /api/cards/{card_id} -> {resp.status_code}")
+    print(f"SQL statements: {len(statements)} (budget {args.budget})")
+    for i, stmt in enumerate(statements, 1):
+        print(f"  {i}. {' '.join(stmt.split())[:120]}")
+
+    if resp.status_code != 200:
+        print("❌ Endpoint did not return 200")
+        return 1
+    if len(statements) > args.budget:
+        print("❌ Over budget")
+        return 1
+    print("✅ Within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,8 @@ Check which card templates are missing from the database compared to templates.c
 """
 
 import csv
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import CardTemplate, Athlete
 from sqlalchemy.orm import joinedload
 
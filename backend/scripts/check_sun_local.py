@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Self-check and micro-benchmark for local SUN verification (sun.py).
+
+Checks, with no database or network:
+  - NXP's published AN12196 example (all-zero keys) decrypts and verifies
+  - synthetic tags built from freshly generated keys verify, in cmac and tt mode
+  - a flipped MAC bit, a wrong key, or a tampered eCode is rejected
+  - TagTamper status comes out of the encrypted file data
+  - verify_many() agrees with verify() one by one
+
+Then it times single and batch verification.
+
+Usage (run from backend/ folder, venv active):
+
+  python scripts/check_sun_local.py
+  python scripts/check_sun_local.py --messages 20000
+  python scripts/check_sun_local.py --new-keys        # print a fresh key-store entry
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sun import KeyStore, SunKeys, SunVerifier, make_message, verify_local
+
+# AN12196 example: SDMMACInputOffset at the enc file data, all-zero keys
+NXP_VECTOR = {
+    "enc": "FD91EC264309878BE6345CBE53BADF40",
+    "eCode": "CEE9A53E3E463EF1F459635736738962",
+    "cmac": "ECC1E7F6C6C73BF6",
+}
+NXP_KEYS = SunKeys(bytes(16), bytes(16), mac_input="{eCode}&{mac_param}=")
+
+
+def check(name: str, cond: bool, failures: list):
+    print(f"  {'✅' if cond else '❌'} {name}")
+    if not cond:
+        failures.append(name)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check and time local NTAG 424 DNA SUN verification")
+    p.add_argument("--messages", type=int, default=5000, help="synthetic messages for the timing run")
+    p.add_argument("--new-keys", action="store_true", help="print a new key-store entry and exit")
+    args = p.parse_args()
+
+    if args.new_keys:
+        print(json.dumps({"meta_key": os.urandom(16).hex().upper(), "file_key": os.urandom(16).hex().upper()}, indent=2))
+        return 0
+
+    failures = []
+    print("🔐 SUN verification checks")
+
+    res = verify_local(NXP_VECTOR, NXP_KEYS)
+    check("AN12196 vector authentic, UID 04958CAA5C5E80, counter 8",
+          res.get("authentic") and res.get("uid") == "04958CAA5C5E80" and res.get("ctr") == 8, failures)
+
+    keys = SunKeys(os.urandom(16), os.urandom(16), tamper=True)
+    uid = bytes.fromhex("04A1B2C3D4E5F6")
+    msg = make_message(keys, uid, 41, file_data=b"CC")
+    res = verify_local(msg, keys)
+    check("synthetic cmac message authentic", res.get("authentic") and res["ctr"] == 41, failures)
+    check("TT status closed/closed", (res.get("ttPermStatus"), res.get("ttCurrStatus")) == ("closed", "closed"), failures)
+
+    tt_msg = make_message(keys, uid, 42, file_data=b"CO", tt_mode=True)
+    res = verify_local(tt_msg, keys)
+    check("synthetic tt message authentic, current status open",
+          res.get("authentic") and res.get("ttCurrStatus") == "open", failures)
+
+    bad = dict(msg, cmac=("%016X" % (int(msg["cmac"], 16) ^ 1)))
+    check("flipped MAC bit rejected", not verify_local(bad, keys).get("authentic"), failures)
+    other = SunKeys(os.urandom(16), keys.file_key, tamper=True)
+    check("wrong meta key rejected", not verify_local(msg, other).get("authentic"), failures)
+    forged = dict(tt_msg, eCode=tt_msg["eCode"][:-2] + ("00" if tt_msg["eCode"][-2:] != "00" else "01"))
+    check("tampered eCode rejected", not verify_local(forged, keys).get("authentic"), failures)
+
+    verifier = SunVerifier(KeyStore(default=keys), mode="local")
+    batch = [make_message(keys, os.urandom(7), n) for n in range(1, 65)] + [bad]
+    one_by_one = [verifier.verify(m) for m in batch]
+    check("verify_many matches verify", verifier.verify_many(batch) == one_by_one, failures)
+    check("local mode rejects unknown tags",
+          SunVerifier(KeyStore(), mode="local").verify(msg).get("reason") == "no_key", failures)
+
+    messages = [make_message(keys, os.urandom(7), n % 0xFFFFFF + 1) for n in range(args.messages)]
+    started = time.perf_counter()
+    for m in messages:
+        verifier.verify(m)
+    single = time.perf_counter() - started
+    started = time.perf_counter()
+    verifier.verify_many(messages)
+    batched = time.perf_counter() - started
+    print(f"⏱️  {args.messages} messages: verify {single / args.messages * 1e6:.1f} µs/msg, "
+          f"verify_many {batched / args.messages * 1e6:.1f} µs/msg")
+
+    if failures:
+        print(f"❌ {len(failures)} check(s) failed")
+        return 1
+    print("✅ all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,8 @@
 Check user's card collection and identify missing cards and broken images.
 """
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import User, CardInstance, CardTemplate, Athlete
 from sqlalchemy.orm import joinedload
 
@@ -9,7 +9,8 @@ Based on templates.csv, we need to create templates for:
 
 import csv
 import uuid
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import Athlete, CardTemplate
 from sqlalchemy.orm import joinedload
 
@@ -6,7 +6,8 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 from models import db, Athlete, AthleteAchievement, AthleteQualification, CardTemplate
 
 def delete_duplicate_ella():
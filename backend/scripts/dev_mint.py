@@ -25,11 +25,13 @@ from datetime import datetime, timezone
 os.environ.setdefault("ETRNL_PRIVATE_KEY", "dev-local")
 os.environ.setdefault("FRONTEND_ORIGIN", "http://localhost:5173")
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import (
     User, Athlete, CardTemplate, CardInstance, ScanEvent, CardStatus
 )
 from sqlalchemy import select
+from minting import allocate_serials, EditionCapReached
 from sqlalchemy.orm import aliased
 
 
@@ -118,23 +120,18 @@ def main():
         # Clear any implicit tx from earlier reads and do one atomic tx
         db.session.rollback()
         with db.session.begin():
-            # Lock template row once (prevents race on minted_count)
-            t_locked = db.session.execute(
-                select(CardTemplate)
-                .where(CardTemplate.id == template.id)
-                .with_for_update()
-            ).scalar_one()
-
-            start_serial = t_locked.minted_count or 0
-
-            for i in range(args.count):
-                serial = start_serial + i + 1
-                t_locked.minted_count = serial
+            # Reserve the whole block of serials in one UPDATE ... RETURNING
+            try:
+                serials = allocate_serials(template.id, args.count)
+            except EditionCapReached:
+                raise SystemExit(f"ERROR: edition_cap {cap} would be exceeded.")
 
+            for serial in serials:
                 tag_id, uid = rand_tag(prefix=args.tag_prefix)
 
                 inst = CardInstance(
-                    template_id=t_locked.id,
+                    id=_uuid.uuid4(),  # known up front so the ScanEvent can reference it
+                    template_id=template.id,
                     serial_no=serial,
                     etrnl_tag_uid=uid,
                     etrnl_tag_id=tag_id,
@@ -3,7 +3,8 @@
 Fix card numbers and image URLs for athletes.
 """
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import Athlete, CardTemplate
 
 
@@ -10,7 +10,8 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import db, Athlete, CardTemplate, CardInstance
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 
 def fix_mathias_templates():
     with app.app_context():
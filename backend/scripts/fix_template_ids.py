@@ -4,7 +4,8 @@ Fix existing card templates by setting their etrnl_url_group_id to match templat
 """
 
 import csv
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import CardTemplate, Athlete
 from sqlalchemy.orm import joinedload
 
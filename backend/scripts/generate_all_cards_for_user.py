@@ -13,7 +13,8 @@ from datetime import datetime, timezone
 import random
 import string
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import (
     User, Athlete, CardTemplate, CardInstance, ScanEvent,
     CardStatus
@@ -14,7 +14,8 @@ sys.path.insert(0, str(backend_dir))
 os.environ['DATABASE_URL'] = os.environ.get('DATABASE_URL', 'postgresql://localhost/dscards')
 
 from models import db, Athlete, AthleteEquipment
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 import uuid
 
 # Brady Ellison's equipment based on Figma design
@@ -24,7 +24,8 @@ import unicodedata
 from pathlib import Path
 from typing import Optional
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import Athlete, CardTemplate
 
 ALLOWED_VERSIONS = {"regular", "diamond"}
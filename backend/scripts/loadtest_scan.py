@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Load test: how many scans can one deployment keep in flight while the
+verification upstream is slow?
+
+The script serves a fake ETRNL that answers after --upstream-delay seconds.
+It then fires --requests scans at /api/scan, --concurrency at a time,
+and reports throughput, latency percentiles and the effective concurrency
+(sum of latencies / wall time).
+
+With sync workers the effective concurrency is capped at the worker count.
+With GUNICORN_WORKER_CLASS=gevent it should track --concurrency.
+
+By default the fake upstream answers "not authentic", so the run measures
+request concurrency around the upstream wait without writing to the DB. Pass
+--authentic to exercise the lookup/replay path as well.
+
+Usage (run from backend/ folder, venv active):
+
+  # spawn gunicorn (gunicorn.conf.py) pointed at the fake upstream
+  python scripts/loadtest_scan.py --concurrency 300 --requests 1200
+
+  # compare with sync workers
+  GUNICORN_WORKER_CLASS=sync python scripts/loadtest_scan.py --concurrency 300 --requests 300
+
+  # against a server you started yourself with ETRNL_URL=http://127.0.0.1:9100/verify
+  python scripts/loadtest_scan.py --target http://127.0.0.1:5001 --upstream-port 9100
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve_fake_upstream(port: int, delay: float, authentic: bool) -> ThreadingHTTPServer:
+    ctr = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(delay)
+            out = json.dumps({
+                "success": True, "authentic": authentic,
+                "uid": f"LOAD-{body.get('tagId')}", "ctr": next(ctr),
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn_server(port: int, upstream_port: int, concurrency: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        ETRNL_URL=f"http://127.0.0.1:{upstream_port}/verify",
+        UPSTREAM_ETRNL_POOL_MAXSIZE=str(concurrency),
+        UPSTREAM_ETRNL_RETRIES="0",
+        SCAN_LOG_MODE=os.getenv("SCAN_LOG_MODE", "buffered"),
+    )
+    proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.3)
+    proc.terminate()
+    raise SystemExit("❌ gunicorn did not come up within 30s")
+
+
+def run(target: str, total: int, concurrency: int, timeout: float) -> tuple[list[float], Counter, float]:
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+
+    def one(i: int):
+        started = time.perf_counter()
+        try:
+            r = session.get(f"{target}/api/scan", timeout=timeout, params={
+                "tagId": f"load{i:06d}", "enc": "00" * 16, "eCode": "0", "cmac": "00" * 8,
+            })
+            outcome = str(r.status_code)
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        return time.perf_counter() - started, outcome
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    return [r[0] for r in results], Counter(r[1] for r in results), wall
+
+
+def main():
+    p = argparse.ArgumentParser(description="Concurrent-scan load test against a slow fake upstream")
+    p.add_argument("--target", help="base URL of a running server (default: spawn gunicorn)")
+    p.add_argument("--port", type=int, default=5055, help="port for the spawned gunicorn (default 5055)")
+    p.add_argument("--upstream-port", type=int, default=9100)
+    p.add_argument("--upstream-delay", type=float, default=1.0, help="fake upstream latency in seconds")
+    p.add_argument("--authentic", action="store_true", help="fake upstream reports tags as authentic")
+    p.add_argument("--concurrency", type=int, default=200)
+    p.add_argument("--requests", type=int, default=800)
+    p.add_argument("--timeout", type=float, default=60.0)
+    args = p.parse_args()
+
+    upstream = serve_fake_upstream(args.upstream_port, args.upstream_delay, args.authentic)
+    proc = None
+    target = args.target
+    if not target:
+        proc = spawn_server(args.port, args.upstream_port, args.concurrency)
+        target = f"http://127.0.0.1:{args.port}"
+
+    try:
+        print(f"🚀 {args.requests} scans, {args.concurrency} concurrent, upstream delay {args.upstream_delay}s → {target}")
+        latencies, outcomes, wall = run(target, args.requests, args.concurrency, args.timeout)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(15)
+        upstream.shutdown()
+
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    print(f"⏱️  wall {wall:.2f}s, {len(latencies) / wall:.1f} req/s")
+    print(f"📈 latency p50 {pct(0.50):.2f}s  p95 {pct(0.95):.2f}s  max {latencies[-1]:.2f}s  "
+          f"mean {statistics.mean(latencies):.2f}s")
+    print(f"🔀 effective concurrency {sum(latencies) / wall:.1f} (upstream-bound ideal: {args.concurrency})")
+    print(f"📋 outcomes {dict(outcomes)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Housekeeping for the month-partitioned ``scans`` table. Run it daily (cron / scheduler):
+
+  1. creates the monthly partitions for the next --ahead months, so new scans
+     never land in the scans_default catch-all. Rows that did land there (the
+     job missed a month) are moved into their month's partition, which
+     Postgres would otherwise refuse to create
+  2. refreshes scan_daily_rollups for the last --rollup-days days (idempotent upsert)
+  3. drops partitions older than --retain-months, after an optional CSV archive
+
+Usage (run from backend/ folder, venv active):
+
+  python scripts/maintain_scan_partitions.py
+  python scripts/maintain_scan_partitions.py --retain-months 13 --archive-dir /var/backups/scans
+  python scripts/maintain_scan_partitions.py --rollup-days 400     # backfill the rollup
+  python scripts/maintain_scan_partitions.py --dry-run
+
+Old months are always rolled up before their partition is dropped, so the
+rollup keeps the history that the raw rows no longer do.
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_app
+app = create_app(minimal=True)
+from models import db
+
+_PARTITION_RE = re.compile(r"^scans_(\d{4})_(\d{2})$")
+
+ROLLUP_SQL = text("""
+INSERT INTO scan_daily_rollups
+  (day, card_instance_id, template_id, scans, authentic_scans, first_scan_at, last_scan_at)
+SELECT (s.created_at AT TIME ZONE 'UTC')::date, s.card_instance_id, ci.template_id,
+       count(*), count(*) FILTER (WHERE s.authentic), min(s.created_at), max(s.created_at)
+FROM scans s
+JOIN card_instances ci ON ci.id = s.card_instance_id
+WHERE s.created_at >= :start AND s.created_at < :end
+GROUP BY 1, 2, 3
+ON CONFLICT (day, card_instance_id) DO UPDATE SET
+  template_id = EXCLUDED.template_id,
+  scans = EXCLUDED.scans,
+  authentic_scans = EXCLUDED.authentic_scans,
+  first_scan_at = EXCLUDED.first_scan_at,
+  last_scan_at = EXCLUDED.last_scan_at
+""")
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"scans_{month:%Y_%m}"
+
+
+def existing_partitions(conn) -> dict[date, str]:
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'scans'
+    """)).scalars()
+    out = {}
+    for name in rows:
+        m = _PARTITION_RE.match(name)
+        if m:
+            out[date(int(m.group(1)), int(m.group(2)), 1)] = name
+    return out
+
+
+def default_months(conn) -> list[date]:
+    """Months that have rows sitting in the scans_default catch-all."""
+    rows = conn.execute(text("SELECT DISTINCT date_trunc('month', created_at)::date FROM scans_default")).scalars()
+    return sorted(rows)
+
+
+def create_partition(conn, month: date, move_default: bool):
+    name = partition_name(month)
+    bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+    if not move_default:
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF scans FOR VALUES {bounds}'))
+        return
+    # Postgres won't create a partition whose range already has rows in the
+    # default partition: take the default out, create, move the rows, put it back
+    where = f"created_at >= '{month}' AND created_at < '{add_months(month, 1)}'"
+    conn.execute(text("ALTER TABLE scans DETACH PARTITION scans_default"))
+    conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF scans FOR VALUES {bounds}'))
+    moved = conn.execute(text(f"INSERT INTO scans SELECT * FROM scans_default WHERE {where}")).rowcount
+    conn.execute(text(f"DELETE FROM scans_default WHERE {where}"))
+    conn.execute(text("ALTER TABLE scans ATTACH PARTITION scans_default DEFAULT"))
+    print(f"🚚 moved {moved} rows from scans_default into {name}")
+
+
+def create_partitions(conn, today: date, ahead: int, dry_run: bool):
+    have = existing_partitions(conn)
+    stranded = default_months(conn)
+    wanted = {add_months(month_start(today), i) for i in range(ahead + 1)} | set(stranded)
+    for month in sorted(wanted):
+        if month in have:
+            continue
+        name = partition_name(month)
+        print(f"➕ create {name} [{month} .. {add_months(month, 1)})")
+        if not dry_run:
+            create_partition(conn, month, move_default=month in stranded)
+    if not dry_run:
+        left = conn.execute(text("SELECT count(*) FROM scans_default")).scalar()
+        if left:
+            print(f"⚠️  scans_default still holds {left} rows; see the recovery note in migration c3d9e1f2a7b4")
+
+
+def rollup(conn, start: date, end: date, dry_run: bool) -> int:
+    """Recompute scan_daily_rollups for UTC days in [start, end)."""
+    print(f"📊 rollup {start} .. {end}")
+    if dry_run:
+        return 0
+    res = conn.execute(ROLLUP_SQL, {
+        "start": datetime.combine(start, datetime.min.time(), timezone.utc),
+        "end": datetime.combine(end, datetime.min.time(), timezone.utc),
+    })
+    return res.rowcount
+
+
+def archive_partition(conn, name: str, archive_dir: str) -> str:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv")
+    raw = conn.connection.dbapi_connection
+    with open(path, "w", newline="") as f, raw.cursor() as cur:
+        cur.copy_expert(f'COPY "{name}" TO STDOUT WITH CSV HEADER', f)
+    return path
+
+
+def drop_old_partitions(conn, today: date, retain_months: int, archive_dir: str | None, dry_run: bool):
+    cutoff = add_months(month_start(today), -retain_months)
+    for month, name in sorted(existing_partitions(conn).items()):
+        if month >= cutoff:
+            continue
+        # Make sure the rollup has the month before its raw rows go away
+        rollup(conn, month, add_months(month, 1), dry_run)
+        if dry_run:
+            print(f"🗑️  would drop {name}")
+            continue
+        conn.execute(text(f'ALTER TABLE scans DETACH PARTITION "{name}"'))
+        if archive_dir:
+            print(f"📦 archived {name} → {archive_partition(conn, name, archive_dir)}")
+        conn.execute(text(f'DROP TABLE "{name}"'))
+        print(f"🗑️  dropped {name}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Create, roll up and expire monthly scans partitions")
+    p.add_argument("--ahead", type=int, default=3, help="future months to pre-create (default 3)")
+    p.add_argument("--retain-months", type=int, default=int(os.getenv("SCAN_RETAIN_MONTHS", "13")),
+                   help="full months of raw scans to keep besides the current one (default 13)")
+    p.add_argument("--archive-dir", default=os.getenv("SCAN_ARCHIVE_DIR"),
+                   help="write each partition to <dir>/<partition>.csv before dropping it")
+    p.add_argument("--rollup-days", type=int, default=2,
+                   help="recompute the rollup for this many recent days (default 2)")
+    p.add_argument("--dry-run", action="store_true")
+    args = p.parse_args()
+
+    today = datetime.now(timezone.utc).date()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            create_partitions(conn, today, args.ahead, args.dry_run)
+        with db.engine.begin() as conn:
+            n = rollup(conn, today - timedelta(days=args.rollup_days - 1), today + timedelta(days=1), args.dry_run)
+            print(f"✅ rollup upserted {n} rows")
+        with db.engine.begin() as conn:
+            drop_old_partitions(conn, today, args.retain_months, args.archive_dir, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
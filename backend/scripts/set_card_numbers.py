@@ -7,7 +7,8 @@ import csv
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import Athlete
 
 def set_card_numbers():
@@ -15,7 +15,8 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import db, Athlete, AthleteAchievement, AthleteEquipment, AthleteQualification, AthleteStats
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 
 def sync_all_athletes():
     """Load all athlete data from athlete_seed.json"""
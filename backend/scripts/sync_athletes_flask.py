@@ -27,7 +27,8 @@ def main():
     sys.path.insert(0, backend_dir)
     
     try:
-        from app import app
+        from app import create_app
+        app = create_app(minimal=True)
         from models import db, Athlete, CardTemplate
     except ImportError as e:
         print(f"❌ Error importing Flask app: {e}")
@@ -12,7 +12,8 @@ from urllib.parse import urlparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import db, Athlete
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 
 def update_brady_socials():
     with app.app_context():
@@ -11,7 +11,8 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from app import app  # noqa: E402
+from app import create_app  # noqa: E402
+app = create_app(minimal=True)
 from models import db, Athlete, AthleteEquipment  # noqa: E402
 
 SEED_PATH = ROOT / "seeds" / "athlete_seed.json"
@@ -11,7 +11,8 @@ Images should be placed in: frontend/public/assets/cards/{sku}.png
 import sys
 from pathlib import Path
 
-from app import app, db
+from app import create_app, db
+app = create_app(minimal=True)
 from models import CardTemplate
 
 # Base URL for your frontend assets
@@ -1,5 +1,6 @@
 from models import db, Athlete, CardTemplate
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 
 ATHLETES = [
   {"full_name":"Ellie Goulding","sport":"Track","nationality":"Canada"},
@@ -0,0 +1,258 @@
+# backend/shopify_ingest.py
+"""
+Durable Shopify webhook ingestion.
+
+The webhook route only verifies the HMAC and calls ``record_webhook()``. That
+appends the raw payload to shopify_webhook_events, keyed by
+X-Shopify-Webhook-Id, with ON CONFLICT DO NOTHING so Shopify's retries are
+deduplicated, and then Shopify gets its 200.
+
+A ShopifyIngestWorker in each gunicorn worker claims unprocessed events in
+batches (FOR UPDATE SKIP LOCKED) and writes shopify_orders and
+shopify_line_items with one executemany INSERT ... ON CONFLICT DO NOTHING per
+table. Row ids are uuid5 of the Shopify ids, so reprocessing an event is a
+no-op.
+
+Line items are linked to a CardTemplate by Shopify variant id, product id, or
+SKU (matched against template_code), in that order. An event that fails to
+parse or write is retried up to SHOPIFY_INGEST_MAX_ATTEMPTS times, then parked
+with processed_at set and last_error kept for inspection. When a batch's
+INSERT fails, its events are written one by one (each in a savepoint), so one
+bad payload cannot hold back the rest.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from background import BackgroundWorker
+from models import db, CardTemplate, ShopifyWebhookEvent, ShopifyOrder, ShopifyLineItem
+
+_NS = uuid.UUID("6f1c2b7e-4b8a-4f4e-9a51-5d0c3e2f9a10")
+
+
+def _insert(model):
+    """Dialect INSERT that supports ON CONFLICT DO NOTHING."""
+    dialect = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model.__table__)
+
+
+def record_webhook(webhook_id: str | None, topic: str, shop_domain: str | None, payload: dict, body: bytes) -> bool:
+    """Append a verified webhook; returns False when it is a duplicate delivery."""
+    webhook_id = webhook_id or "sha256:" + hashlib.sha256(body).hexdigest()
+    stmt = _insert(ShopifyWebhookEvent).values(
+        id=uuid.uuid4(), webhook_id=webhook_id, topic=topic, shop_domain=shop_domain,
+        payload=payload, attempts=0,
+    ).on_conflict_do_nothing(index_elements=["webhook_id"])
+    inserted = db.session.execute(stmt).rowcount == 1
+    db.session.commit()
+    if inserted:
+        ingest_worker.ensure_started()
+        ingest_worker.wake()
+    return inserted
+
+
+def _int(v):
+    try:
+        return int(v) if v is not None and v != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _money(v):
+    try:
+        return Decimal(str(v)) if v is not None else None
+    except InvalidOperation:
+        return None
+
+
+def _when(v):
+    if not v:
+        return None
+    try:
+        return datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _template_lookup() -> dict[str, uuid.UUID]:
+    """One query: 'variant:<id>' / 'product:<id>' / 'sku:<code>' -> template id."""
+    lookup = {}
+    rows = db.session.execute(
+        select(CardTemplate.id, CardTemplate.variant_id, CardTemplate.product_id, CardTemplate.template_code)
+    ).all()
+    for tid, variant_id, product_id, code in rows:
+        if code:
+            lookup.setdefault(f"sku:{code}", tid)
+        if product_id:
+            lookup.setdefault(f"product:{product_id}", tid)
+        if variant_id:
+            lookup.setdefault(f"variant:{variant_id}", tid)
+    return lookup
+
+
+def parse_order(event_id, payload: dict, templates: dict) -> tuple[dict, list[dict]]:
+    """Order row and line-item rows for one orders/* payload."""
+    shopify_id = _int(payload.get("id"))
+    if shopify_id is None:
+        raise ValueError("payload has no order id")
+    order_id = uuid.uuid5(_NS, f"order:{shopify_id}")
+    customer = payload.get("customer") or {}
+    order = {
+        "id": order_id,
+        "shopify_order_id": shopify_id,
+        "name": payload.get("name"),
+        "email": (payload.get("email") or customer.get("email") or "").lower() or None,
+        "shopify_customer_id": _int(customer.get("id")),
+        "financial_status": payload.get("financial_status"),
+        "currency": payload.get("currency"),
+        "total_price": _money(payload.get("total_price")),
+        "ordered_at": _when(payload.get("created_at")),
+        "webhook_event_id": event_id,
+    }
+    items = []
+    for li in payload.get("line_items") or []:
+        li_id = _int(li.get("id"))
+        if li_id is None:
+            continue
+        variant_id = str(li["variant_id"]) if li.get("variant_id") is not None else None
+        product_id = str(li["product_id"]) if li.get("product_id") is not None else None
+        sku = li.get("sku") or None
+        template_id = (templates.get(f"variant:{variant_id}") or templates.get(f"product:{product_id}")
+                       or templates.get(f"sku:{sku}"))
+        items.append({
+            "id": uuid.uuid5(_NS, f"line_item:{li_id}"),
+            "order_id": order_id,
+            "shopify_line_item_id": li_id,
+            "product_id": product_id,
+            "variant_id": variant_id,
+            "sku": sku,
+            "title": li.get("title"),
+            "quantity": _int(li.get("quantity")) or 1,
+            "price": _money(li.get("price")),
+            "template_id": template_id,
+        })
+    return order, items
+
+
+class ShopifyIngestWorker(BackgroundWorker):
+    def __init__(self, batch_size: int = 100, interval: float = 5.0, max_attempts: int = 5):
+        super().__init__("shopify-ingest", interval)
+        self.app = None
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.stats = {"events": 0, "orders": 0, "line_items": 0, "unmapped_items": 0, "failed": 0, "batches": 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+    def _process_batch(self) -> int:
+        events = db.session.execute(
+            select(ShopifyWebhookEvent.id, ShopifyWebhookEvent.topic, ShopifyWebhookEvent.payload,
+                   ShopifyWebhookEvent.attempts)
+            .where(ShopifyWebhookEvent.processed_at.is_(None))
+            .order_by(ShopifyWebhookEvent.received_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not events:
+            db.session.rollback()
+            return 0
+
+        templates = _template_lookup()
+        now = datetime.now(timezone.utc)
+        parsed, skipped, failed = [], [], []
+        for event_id, topic, payload, attempts in events:
+            if not topic.startswith("orders/"):
+                skipped.append(event_id)   # recorded for the audit trail only
+                continue
+            try:
+                order, order_items = parse_order(event_id, payload or {}, templates)
+            except Exception as e:
+                failed.append((event_id, attempts + 1, f"{type(e).__name__}: {e}"))
+                continue
+            parsed.append((event_id, attempts, order, order_items))
+
+        try:
+            with db.session.begin_nested():
+                orders, items = self._write(parsed, skipped, now)
+            written = len(parsed)
+        except Exception as e:
+            # One bad row fails the whole statement: find it event by event
+            print(f"⚠️ Shopify ingest batch insert failed, retrying per event: {e}")
+            self._write([], skipped, now)
+            orders, items, written = {}, {}, 0
+            for event_id, attempts, order, order_items in parsed:
+                try:
+                    with db.session.begin_nested():
+                        o, i = self._write([(event_id, attempts, order, order_items)], [], now)
+                except Exception as e:
+                    failed.append((event_id, attempts + 1, f"{type(e).__name__}: {e}"))
+                    continue
+                orders.update(o)
+                items.update(i)
+                written += 1
+        for event_id, attempts, error in failed:
+            db.session.execute(update(ShopifyWebhookEvent).where(ShopifyWebhookEvent.id == event_id).values(
+                attempts=attempts, last_error=error,
+                processed_at=now if attempts >= self.max_attempts else None,
+            ))
+        db.session.commit()
+
+        self._count(events=written + len(skipped), orders=len(orders), line_items=len(items),
+                    failed=len(failed), batches=1,
+                    unmapped_items=sum(1 for li in items.values() if li["template_id"] is None))
+        return len(events)
+
+    def _write(self, parsed, skipped, now) -> tuple[dict, dict]:
+        """Insert the parsed events' orders and line items, and mark them and ``skipped`` processed."""
+        orders, items = {}, {}
+        for _, _, order, order_items in parsed:
+            orders[order["shopify_order_id"]] = order
+            for li in order_items:
+                items[li["shopify_line_item_id"]] = li
+        if orders:
+            db.session.execute(_insert(ShopifyOrder).on_conflict_do_nothing(
+                index_elements=["shopify_order_id"]), list(orders.values()))
+        if items:
+            db.session.execute(_insert(ShopifyLineItem).on_conflict_do_nothing(
+                index_elements=["shopify_line_item_id"]), list(items.values()))
+        done = skipped + [event_id for event_id, _, _, _ in parsed]
+        if done:
+            db.session.execute(update(ShopifyWebhookEvent).where(ShopifyWebhookEvent.id.in_(done))
+                               .values(processed_at=now, last_error=None))
+        return orders, items
+
+    def tick(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            while True:
+                try:
+                    n = self._process_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Shopify ingest batch failed: {e}")
+                    return
+                if n < self.batch_size:
+                    return
+
+
+ingest_worker = ShopifyIngestWorker()
+
+
+def init_shopify_ingest(app):
+    ingest_worker.app = app
+    ingest_worker.batch_size = int(os.getenv("SHOPIFY_INGEST_BATCH", str(ingest_worker.batch_size)))
+    ingest_worker.interval = float(os.getenv("SHOPIFY_INGEST_INTERVAL", str(ingest_worker.interval)))
+    ingest_worker.max_attempts = int(os.getenv("SHOPIFY_INGEST_MAX_ATTEMPTS", str(ingest_worker.max_attempts)))
+    # Started per worker after the fork; also drains events left by earlier processes
+    app.before_request(ingest_worker.ensure_started)
@@ -0,0 +1,85 @@
+# backend/singleflight.py
+"""
+Coalescing for concurrent work on the same key (e.g. two taps of a fresh tag).
+
+In process, ``SingleFlight.do(key, fn, token)`` runs ``fn`` once per key at a
+time. A caller arriving while a call for the same key is in flight waits for
+it, then:
+  - gets the leader's result if it passed the same ``token`` (the identical
+    request, such as a double-fired tap or a refresh)
+  - otherwise runs ``fn`` itself, after the leader. For a scan that means it
+    sees the card the leader minted instead of racing it.
+
+Across gunicorn workers, ``advisory_xact_lock()`` takes a Postgres
+transaction-level advisory lock for a key. A first-sighting mint holds it and
+looks the tag up again before inserting, so two workers can't both mint the
+same tag. The lock is released at commit/rollback.
+"""
+import hashlib
+import threading
+
+from sqlalchemy import text
+
+
+class _Call:
+    __slots__ = ("token", "done", "result", "error")
+
+    def __init__(self, token):
+        self.token = token
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.stats = {"leaders": 0, "shared": 0, "waited": 0}
+
+    def do(self, key, fn, token=None):
+        """Run ``fn()`` as the only in-flight call for ``key``; returns (result, shared)."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call(token)
+                    self.stats["leaders"] += 1
+                    break
+                self.stats["waited"] += 1
+            if not call.done.wait(self.timeout):
+                # Leader is stuck; don't hold this request hostage
+                return fn(), False
+            if token is not None and call.token == token and call.error is None:
+                with self._lock:
+                    self.stats["shared"] += 1
+                return call.result, True
+            # Different request (or the leader failed): go again, now after the leader
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+def _lock_id(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def advisory_xact_lock(session, key: str) -> bool:
+    """Block until this transaction holds the advisory lock for ``key`` (Postgres only).
+
+    Returns False on other databases, where the caller has no cross-process
+    guard and nothing to re-check.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _lock_id(key)})
+    return True
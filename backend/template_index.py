@@ -0,0 +1,147 @@
+# backend/template_index.py
+"""
+In-memory hint -> template lookup shared by the scan, verification and admin routes.
+
+A "template hint" from a tag URL or an admin form can be the CardTemplate UUID
+(dashed or hex), its template_code (SKU / spreadsheet code, e.g. SL-REG or
+000000000018), or its ETRNL url group id. The index maps every one of those to
+a small immutable TemplateRef. Resolving a hint on the scan path therefore
+costs no queries.
+
+The index is built at startup and rebuilt (one query) on the next lookup after
+any of these:
+  - a CardTemplate write commits in this process
+  - TEMPLATE_INDEX_TTL seconds pass (covers scripts/load_templates_from_csv.py
+    and the other gunicorn workers)
+  - a lookup misses, at most once per TEMPLATE_INDEX_MISS_REFRESH seconds, so a
+    template created elsewhere becomes visible without letting junk hints hammer the DB
+
+Precedence when keys collide: UUID, then template_code, then ETRNL group id.
+Within one kind the oldest template wins.
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import db, CardTemplate
+
+
+@dataclass(frozen=True)
+class TemplateRef:
+    id: uuid.UUID
+    template_code: str | None
+    etrnl_url_group_id: str | None
+    version: str
+    athlete_id: uuid.UUID
+    edition_cap: int | None
+
+
+class TemplateIndex:
+    def __init__(self, ttl: float = 300.0, miss_refresh: float = 10.0):
+        self.ttl = ttl
+        self.miss_refresh = miss_refresh
+        self._by_hint: dict[str, TemplateRef] | None = None
+        self._built_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def build(self):
+        rows = db.session.execute(
+            select(
+                CardTemplate.id, CardTemplate.template_code, CardTemplate.etrnl_url_group_id,
+                CardTemplate.version, CardTemplate.athlete_id, CardTemplate.edition_cap,
+            ).order_by(CardTemplate.created_at.desc())
+        ).all()
+        refs = [TemplateRef(*r) for r in rows]
+        by_hint = {}
+        # Lowest precedence first, newest first: later assignments win
+        for ref in refs:
+            if ref.etrnl_url_group_id:
+                by_hint[ref.etrnl_url_group_id] = ref
+        for ref in refs:
+            if ref.template_code:
+                if ref.template_code in by_hint and by_hint[ref.template_code].template_code == ref.template_code:
+                    print(f"⚠️  template_code {ref.template_code!r} is shared by several templates; using the oldest")
+                by_hint[ref.template_code] = ref
+        for ref in refs:
+            by_hint[str(ref.id)] = ref
+        with self._lock:
+            self._by_hint = by_hint
+            self._built_at = time.monotonic()
+            self._stale = False
+        return len(refs)
+
+    def _fresh(self) -> dict[str, TemplateRef]:
+        by_hint = self._by_hint
+        if by_hint is None or self._stale or time.monotonic() - self._built_at > self.ttl:
+            self.build()
+            by_hint = self._by_hint
+        return by_hint
+
+    def find(self, hint) -> TemplateRef | None:
+        if not hint:
+            return None
+        key = _normalize(str(hint).strip())
+        ref = self._fresh().get(key)
+        if ref is None and time.monotonic() - self._built_at > self.miss_refresh:
+            self.build()
+            ref = self._by_hint.get(key)
+        return ref
+
+    def invalidate(self):
+        self._stale = True
+
+
+def _normalize(hint: str) -> str:
+    """Canonical dashed lowercase form for UUID hints (hex, braces, upper case); others as-is."""
+    try:
+        return str(uuid.UUID(hint))
+    except ValueError:
+        return hint
+
+
+index = TemplateIndex()
+
+
+def find_template(hint) -> TemplateRef | None:
+    """Resolve a template by UUID, template_code (SKU) or ETRNL group id, usually without a query."""
+    return index.find(hint)
+
+
+def init_template_index(app):
+    index.ttl = float(app.config.get("TEMPLATE_INDEX_TTL", os.getenv("TEMPLATE_INDEX_TTL", "300")))
+    index.miss_refresh = float(os.getenv("TEMPLATE_INDEX_MISS_REFRESH", "10"))
+    with app.app_context():
+        try:
+            print(f"🗂️  Template index: {index.build()} templates")
+        except Exception as e:  # no DB yet (e.g. before the first migration): build on first lookup
+            print(f"⚠️  Template index not built at startup: {e}")
+        finally:
+            db.session.remove()
+            # Don't hand a connection opened here to forked gunicorn workers
+            db.engine.dispose()
+
+
+# ---------------- invalidation hooks ----------------
+@event.listens_for(Session, "after_flush")
+def _note_template_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CardTemplate):
+            session.info["template_index_dirty"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("template_index_dirty", None):
+        index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("template_index_dirty", None)
@@ -8,7 +8,8 @@ import sys
 import os
 sys.path.append('.')
 
-from app import app
+from app import create_app
+app = create_app(minimal=True)
 from models import db, CardTemplate, Athlete
 
 def update_card_urls():
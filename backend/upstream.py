@@ -0,0 +1,231 @@
+# backend/upstream.py
+"""
+Shared HTTP client for the tag-verification upstreams (ETRNL, Titan NFC).
+
+Every caller goes through a named UpstreamClient, which gives it:
+  - a keep-alive requests.Session with per-host connection pools
+  - connect/read timeouts configured per upstream
+  - bounded retries with full-jitter backoff on connection errors and 502/503/504
+  - a circuit breaker that fails fast while an upstream is degraded
+  - request/error/latency counters (``stats()``)
+  - observers (``add_observer()``) called with each attempt's latency
+
+Settings come from the environment, per upstream name, e.g.
+UPSTREAM_ETRNL_READ_TIMEOUT=5 or UPSTREAM_TITAN_NFC_RETRIES=0. Tests and local
+dev can point ETRNL_URL / TITAN_NFC_URL at a fake server, or swap a client
+entirely with ``set_client()``.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ETRNL_URL = os.environ.get('ETRNL_URL', 'https://third-party.etrnl.app/v1/tags/verify-authenticity')
+ETRNL_KEY = os.environ.get('ETRNL_PRIVATE_KEY', '')
+
+RETRY_STATUSES = (502, 503, 504)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class UpstreamError(requests.RequestException):
+    """Raised when an upstream call fails; a RequestException so callers' handlers still apply."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The upstream is marked degraded; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures, retries after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True   # let exactly one probe through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    def __init__(self, name: str, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.2, pool_maxsize: int = 16,
+                 breaker: CircuitBreaker | None = None):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0, 'errors': 0, 'retries': 0, 'short_circuited': 0,
+            'latency_sum': 0.0, 'latency_max': 0.0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        }
+
+    @classmethod
+    def from_env(cls, name: str, **defaults):
+        prefix = f"UPSTREAM_{name.upper()}_"
+
+        def env(key, default):
+            return os.environ.get(prefix + key, default)
+
+        return cls(
+            name,
+            connect_timeout=float(env('CONNECT_TIMEOUT', defaults.get('connect_timeout', 3.05))),
+            read_timeout=float(env('READ_TIMEOUT', defaults.get('read_timeout', 10.0))),
+            retries=int(env('RETRIES', defaults.get('retries', 2))),
+            backoff=float(env('BACKOFF', defaults.get('backoff', 0.2))),
+            pool_maxsize=int(env('POOL_MAXSIZE', defaults.get('pool_maxsize', 16))),
+            breaker=CircuitBreaker(
+                failure_threshold=int(env('BREAKER_THRESHOLD', defaults.get('breaker_threshold', 5))),
+                reset_timeout=float(env('BREAKER_RESET', defaults.get('breaker_reset', 30.0))),
+            ),
+        )
+
+    def _record(self, elapsed: float, ok: bool):
+        for observer in _observers:
+            observer(self.name, elapsed, ok)
+        with self._lock:
+            s = self._stats
+            s['requests'] += 1
+            if not ok:
+                s['errors'] += 1
+            s['latency_sum'] += elapsed
+            s['latency_max'] = max(s['latency_max'], elapsed)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    s['latency_buckets'][i] += 1
+                    break
+            else:
+                s['latency_buckets'][-1] += 1
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats, latency_buckets=list(self._stats['latency_buckets']))
+        out['breaker'] = self.breaker.state
+        return out
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request with retries; raises UpstreamError/RequestException on failure."""
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"{self.name} circuit open")
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(time.perf_counter() - started, ok=False)
+                # A read timeout may mean the upstream is just slow: don't pile on
+                if not isinstance(e, requests.ConnectionError) or attempt >= self.retries:
+                    self.breaker.record_failure()
+                    raise
+            except requests.RequestException:
+                # Anything else (ChunkedEncodingError, InvalidURL, ...): not retryable, but it
+                # must still settle the breaker, or a half-open probe would never be released
+                self._record(time.perf_counter() - started, ok=False)
+                self.breaker.record_failure()
+                raise
+            else:
+                ok = resp.status_code < 500
+                self._record(time.perf_counter() - started, ok=ok)
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    (self.breaker.record_success if ok else self.breaker.record_failure)()
+                    return resp
+            attempt += 1
+            self._count('retries')
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+
+_observers: list = []
+
+
+def add_observer(fn):
+    """Call ``fn(name, elapsed, ok)`` after every upstream attempt (e.g. request metrics)."""
+    if fn not in _observers:
+        _observers.append(fn)
+
+
+_clients: dict[str, UpstreamClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> UpstreamClient:
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name) or UpstreamClient.from_env(name)
+            _clients[name] = client
+    return client
+
+
+def set_client(name: str, client: UpstreamClient):
+    """Swap the client for an upstream (e.g. one pointed at a local fake server)."""
+    _clients[name] = client
+
+
+def all_stats() -> dict:
+    return {name: c.stats() for name, c in list(_clients.items())}
+
+
+def etrnl_verify(payload: dict) -> dict:
+    """POST a SUN message to ETRNL's verify-authenticity endpoint and return its JSON."""
+    r = get_client('etrnl').post(
+        ETRNL_URL, json=payload,
+        headers={'API-KEY': ETRNL_KEY, 'Content-Type': 'application/json'},
+    )
+    try:
+        return r.json()
+    except ValueError as e:
+        raise UpstreamError(f"etrnl returned non-JSON (HTTP {r.status_code})") from e
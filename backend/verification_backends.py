@@ -0,0 +1,315 @@
+# backend/verification_backends.py
+"""
+Registry of tag-verification backends for the scan pipeline (scan_pipeline.py).
+
+Each backend knows three things:
+  - which request parameters it understands: ``claim(params)`` returns a Claim or None
+  - whether it can verify that claim right now: ``available(claim, template)``
+  - how to verify it: ``verify(claim, template)`` returns a Verdict, or raises
+    requests.RequestException when its upstream fails
+
+Backends, in selection order (SCAN_BACKENDS overrides order and set):
+  sun_local  NTAG 424 DNA SUN (tagId enc eCode cmac|tt), verified in process with sun.py keys
+  etrnl      the same SUN message, verified by ETRNL (tags we hold no key for)
+  titan_nfc  Titan NFC tags (id data), verified by the Titan NFC service
+
+The dev backend (fake tags, dev=1, never in production) is always registered
+for the /api/*/dev endpoints, which ask for it by name. Other scan requests
+only reach it with SCAN_DEV_BACKEND=1.
+
+SUN_VERIFY_MODE still applies: ``remote`` skips sun_local, ``local`` skips etrnl.
+
+The registry also keeps per-backend histograms of verification latency and
+whole-scan latency plus outcome counters (``stats()``); instrumentation.py
+serves them on /metrics.
+"""
+import os
+import secrets
+import threading
+from dataclasses import dataclass, field
+
+import sun
+from ttl_cache import TTLCache
+from upstream import UpstreamError, etrnl_verify, get_client
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+@dataclass
+class Claim:
+    tag_id: str
+    payload: dict
+    token: tuple                      # identical requests share one in-flight result
+    template_hint: str | None = None
+    response: dict = field(default_factory=dict)   # extra response fields (dev tags)
+
+
+@dataclass
+class Verdict:
+    authentic: bool
+    uid: str | None = None
+    ctr: int | None = None            # None: the tag has no read counter, so no replay check
+    tt_curr: str | None = None
+    tt_perm: str | None = None
+
+
+def _param(params, *names):
+    for n in names:
+        v = params.get(n)
+        if v:
+            return v
+    return None
+
+
+class VerificationBackend:
+    name = ""
+    need = ""                         # parameters, for the missing_params response
+    match_column = "etrnl_tag_uid"    # CardInstance column holding the tag identity (uid or tag id)
+    reject_status = 400               # status for not_authentic
+    error_reason = "verify_upstream_error"
+
+    def claim(self, params, template_hint=None, tag_id_hint=None) -> Claim | None:
+        raise NotImplementedError
+
+    def available(self, claim: Claim, template) -> bool:
+        return True
+
+    def verify(self, claim: Claim, template) -> Verdict:
+        raise NotImplementedError
+
+
+class _SunBackend(VerificationBackend):
+    need = "tagId enc eCode and tt (tamper) OR cmac (mac)"
+
+    def claim(self, params, template_hint=None, tag_id_hint=None):
+        tag_id = tag_id_hint or _param(params, "tagId", "tid")
+        enc = _param(params, "enc", "e")
+        eCode = _param(params, "eCode", "de")
+        tt = _param(params, "tt")                 # tamper token (tamper mode)
+        cmac = _param(params, "cmac", "c")        # MAC (non-tamper mode)
+        if not tag_id or not enc or not eCode or not (tt or cmac):
+            return None
+        payload = {"tagId": tag_id, "eCode": eCode, "enc": enc}
+        if tt:
+            payload["tt"] = tt
+        else:
+            payload["cmac"] = cmac
+        return Claim(tag_id, payload, token=(enc, eCode, tt or cmac), template_hint=template_hint)
+
+    @staticmethod
+    def _verdict(data: dict) -> Verdict:
+        return Verdict(
+            authentic=bool(data.get("success") and data.get("authentic")),
+            uid=data.get("uid"),
+            ctr=int(data.get("ctr", 0) or 0),
+            tt_curr=data.get("ttCurrStatus"),
+            tt_perm=data.get("ttPermStatus"),
+        )
+
+
+class SunLocalBackend(_SunBackend):
+    name = "sun_local"
+
+    def _keys(self, claim, template):
+        return sun.verifier.store.lookup(claim.tag_id, sun.template_groups(claim.template_hint, template))
+
+    def available(self, claim, template):
+        return sun.verifier.mode != "remote" and self._keys(claim, template) is not None
+
+    def verify(self, claim, template):
+        return self._verdict(sun.verify_local(claim.payload, self._keys(claim, template), sun.verifier.uid_case))
+
+
+class EtrnlBackend(_SunBackend):
+    name = "etrnl"
+
+    def available(self, claim, template):
+        return sun.verifier.mode != "local"
+
+    def verify(self, claim, template):
+        return self._verdict(etrnl_verify(claim.payload))
+
+
+class TitanNfcBackend(VerificationBackend):
+    name = "titan_nfc"
+    need = "tagId (id) and data (encrypted) parameters"
+    match_column = "etrnl_tag_id"
+    reject_status = 200
+    error_reason = "verification_service_error"
+
+    def __init__(self):
+        self.url = os.environ.get("TITAN_NFC_URL")
+        self.key = os.environ.get("TITAN_NFC_KEY")
+        # Same message submitted twice (double-fired tap, page refresh) -> reuse the verdict
+        self.cache = TTLCache(
+            maxsize=int(os.environ.get("TITAN_VERIFY_CACHE_SIZE", "2048")),
+            ttl=float(os.environ.get("TITAN_VERIFY_CACHE_TTL", "30")),
+        )
+
+    def claim(self, params, template_hint=None, tag_id_hint=None):
+        if any(k in params for k in ("eCode", "de", "cmac", "c", "tt")):
+            return None   # a (possibly malformed) SUN message, not a Titan NFC one
+        tag_id = tag_id_hint or _param(params, "tagId", "tid", "id")
+        data = _param(params, "data", "enc", "encrypted")
+        if not tag_id or not data:
+            return None
+        return Claim(tag_id, {"id": tag_id, "data": data}, token=(data,), template_hint=template_hint)
+
+    def verify(self, claim, template):
+        key = (claim.tag_id, claim.payload["data"])
+        result = self.cache.get(key)
+        if result is None:
+            result = self._call(claim)
+            if isinstance(result, dict) and result.get("authentic"):
+                # Only authentic verdicts: a rejection may be a garbled read, worth a fresh look
+                self.cache.set(key, result)
+        else:
+            print(f"♻️ Titan NFC verification cache hit: tag_id={claim.tag_id}")
+        data = result if isinstance(result, dict) else {}
+        return Verdict(
+            authentic=bool(data.get("authentic", False)) if isinstance(result, dict) else bool(result),
+            uid=claim.tag_id,   # Titan tags are identified by their tag id
+            tt_curr=data.get("status"),
+            tt_perm=data.get("permanent_status"),
+        )
+
+    def _call(self, claim):
+        print(f"🔍 Titan NFC verification: tag_id={claim.tag_id}, data={claim.payload['data'][:16]}...")
+        response = get_client("titan_nfc").get(self.url, params=claim.payload, headers={"Authorization": self.key})
+        print(f"📡 Titan NFC response: status={response.status_code}, content={response.text[:100]}...")
+        if response.status_code != 200:
+            raise UpstreamError(f"HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            return False   # not JSON: not a verdict we can trust
+
+
+class DevBackend(VerificationBackend):
+    """Fake tags: every claim is authentic. Only outside production."""
+    name = "dev"
+    need = "dev=1 and t (template), optionally tagId"
+
+    def claim(self, params, template_hint=None, tag_id_hint=None):
+        if os.getenv("FLASK_ENV") == "production" or str(params.get("dev", "")) not in ("1", "true"):
+            return None
+        tag_id = tag_id_hint or _param(params, "tagId", "tag_id")
+        uid = tag_id or secrets.token_hex(8)
+        tag_id = tag_id or f"fake-{secrets.token_hex(6)}"
+        return Claim(tag_id, {"uid": uid}, token=None, template_hint=template_hint,
+                     response={"dev_mode": True, "fake_uid": uid, "fake_tag_id": tag_id, "tag_id": tag_id})
+
+    def verify(self, claim, template):
+        return Verdict(authentic=True, uid=claim.payload["uid"])
+
+
+class BackendStats:
+    __slots__ = ("verify_buckets", "verify_sum", "verify_count", "verify_errors",
+                 "scan_buckets", "scan_sum", "outcomes")
+
+    def __init__(self):
+        self.verify_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.verify_sum = 0.0
+        self.verify_count = 0
+        self.verify_errors = 0
+        self.scan_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.scan_sum = 0.0
+        self.outcomes: dict[str, int] = {}
+
+
+def _bucket(buckets: list, elapsed: float):
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if elapsed <= bound:
+            buckets[i] += 1
+            return
+    buckets[-1] += 1
+
+
+class Registry:
+    def __init__(self, backends=()):
+        self._backends: dict[str, VerificationBackend] = {}
+        self._default: list[str] = []     # tried when the caller doesn't name backends
+        self._lock = threading.Lock()
+        self._stats: dict[str, BackendStats] = {}
+        for b in backends:
+            self.register(b)
+
+    def register(self, backend: VerificationBackend, default: bool = True):
+        """Add a backend; with ``default=False`` only callers that name it (``only=``) reach it."""
+        self._backends[backend.name] = backend
+        if default and backend.name not in self._default:
+            self._default.append(backend.name)
+        self._stats.setdefault(backend.name, BackendStats())
+
+    def get(self, name: str) -> VerificationBackend:
+        return self._backends[name]
+
+    def backends(self, only=None) -> list[VerificationBackend]:
+        names = self._default if only is None else only
+        return [self._backends[n] for n in names if n in self._backends]
+
+    def select(self, params, template, template_hint=None, tag_id_hint=None, only=None):
+        """
+        First backend that understands the parameters and can verify them now.
+        Returns (backend, claim); (None, claim) when some backend understood the
+        request but none can verify it (e.g. no local key in SUN_VERIFY_MODE=local);
+        (None, None) when nothing understood it.
+        """
+        first_claim = None
+        for backend in self.backends(only):
+            claim = backend.claim(params, template_hint, tag_id_hint)
+            if claim is None:
+                continue
+            if backend.available(claim, template):
+                return backend, claim
+            first_claim = first_claim or claim
+        return None, first_claim
+
+    # ---------------- stats ----------------
+    def observe_verify(self, name: str, elapsed: float, ok: bool):
+        with self._lock:
+            s = self._stats[name]
+            s.verify_count += 1
+            s.verify_sum += elapsed
+            if not ok:
+                s.verify_errors += 1
+            _bucket(s.verify_buckets, elapsed)
+
+    def observe_scan(self, name: str, elapsed: float, outcome: str):
+        with self._lock:
+            s = self._stats[name]
+            s.scan_sum += elapsed
+            s.outcomes[outcome] = s.outcomes.get(outcome, 0) + 1
+            _bucket(s.scan_buckets, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "verify_count": s.verify_count, "verify_errors": s.verify_errors,
+                    "verify_sum": s.verify_sum, "verify_buckets": list(s.verify_buckets),
+                    "scan_count": sum(s.outcomes.values()), "scan_sum": s.scan_sum,
+                    "scan_buckets": list(s.scan_buckets), "outcomes": dict(s.outcomes),
+                }
+                for name, s in self._stats.items()
+            }
+
+
+_BUILTIN = {
+    "sun_local": SunLocalBackend,
+    "etrnl": EtrnlBackend,
+    "titan_nfc": TitanNfcBackend,
+}
+
+
+def default_registry() -> Registry:
+    names = [n.strip() for n in os.getenv("SCAN_BACKENDS", ",".join(_BUILTIN)).split(",") if n.strip()]
+    unknown = [n for n in names if n not in _BUILTIN]
+    if unknown:
+        raise ValueError(f"unknown SCAN_BACKENDS entries: {', '.join(unknown)}")
+    reg = Registry(_BUILTIN[n]() for n in names)
+    reg.register(DevBackend(), default=os.getenv("SCAN_DEV_BACKEND", "0") == "1")
+    return reg
+
+
+registry = default_registry()
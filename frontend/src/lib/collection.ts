@@ -2,28 +2,42 @@ export type CollectionItem = {
     id: string;                 // card instance id
     serial_no: number;
     status: string;
+    created_at?: string | null;
     template: { version: string | null; image_url: string | null; glb_url: string | null };
-    athlete: { id: string; full_name: string; slug: string; card_image_url: string | null };
+    athlete: {
+      id: string; full_name: string; slug: string; card_image_url: string | null;
+      card_number?: number | null; series_number?: number | null;
+    };
   };
+
+  export type CollectionPage = { items: CollectionItem[]; next_cursor: string | null };
   
   const API = import.meta.env.VITE_API_BASE_URL || '';
+  const PAGE_SIZE = 50;  // server default; up to 200
   
-  export async function fetchMyCollection(): Promise<{ items: CollectionItem[] }> {
+  export async function fetchCollectionPage(cursor?: string | null, limit = PAGE_SIZE): Promise<CollectionPage> {
     const authToken = localStorage.getItem('auth_token')
-    let url = new URL('/api/collection', API).toString()
+    const url = new URL('/api/collection', API || window.location.origin)
+    url.searchParams.set('limit', String(limit))
+    if (cursor) url.searchParams.set('cursor', cursor)
     
     if (authToken) {
       // Send auth token as query parameter instead of header (Safari blocks Authorization header)
-      url += `?auth_token=${encodeURIComponent(authToken)}`
+      url.searchParams.set('auth_token', authToken)
       console.log('🔐 Sending auth token as query parameter for collection:', `${authToken.substring(0, 20)}...`)
     } else {
         console.log('❌ No auth token found in localStorage for collection fetch')
     }
     
-    console.log('🌐 Fetching /api/collection with URL:', url)
-    const r = await fetch(url, { credentials: 'include' });
+    console.log('🌐 Fetching /api/collection page, cursor:', cursor || '(first)')
+    const r = await fetch(url.toString(), { credentials: 'include' });
     if (r.status === 401) throw new Error('auth');
     if (!r.ok) throw new Error('fetch_failed');
     return r.json();
   }
-  
\ No newline at end of file
+
+  // One page of the collection; pass the returned next_cursor to load the next one
+  export async function fetchMyCollection(cursor?: string | null): Promise<CollectionPage> {
+    const page = await fetchCollectionPage(cursor)
+    return { items: page.items || [], next_cursor: page.next_cursor || null }
+  }
@@ -1,6 +1,6 @@
 // src/pages/CardView.tsx
 import { useEffect, useState } from 'react'
-import { useParams, useNavigate, Link } from 'react-router-dom'
+import { useParams, useNavigate, useLocation, Link } from 'react-router-dom'
 import ClaimModal from '../components/ClaimModal'
 import './cardview.css'
 
@@ -187,9 +187,18 @@ const getYouTubeEmbedUrl = (url: string) => {
   return url
 }
 
+async function fetchCard(cardId: string): Promise<CardResponse> {
+  const base = import.meta.env.VITE_API_BASE_URL || ''
+  const url = new URL(`/api/cards/${cardId}`, base)
+  const r = await fetch(url.toString(), { credentials: 'include' })
+  if (!r.ok) throw new Error(`Card ${r.status}`)
+  return r.json()
+}
+
 export default function CardView() {
   const { cardId } = useParams()
   const navigate = useNavigate()
+  const location = useLocation()
 
   const [loading, setLoading] = useState(true)
   const [claiming, setClaiming] = useState(false)
@@ -203,14 +212,20 @@ export default function CardView() {
 
   useEffect(() => {
     let canceled = false
+    // ScanLanding passes the card it got back from the scan (?include=card).
+    // Use it for this first render only: history keeps location.state across
+    // reloads and back/forward, where it would show a stale (pre-claim) card
+    const prefetched = (location.state as { card?: CardResponse } | null)?.card
+    if (prefetched) navigate(location.pathname, { replace: true, state: null })
+    if (prefetched && prefetched.id === cardId) {
+      setCard(prefetched)
+      setLoading(false)
+      return
+    }
     async function go() {
       setLoading(true); setErr(null)
       try {
-        const base = import.meta.env.VITE_API_BASE_URL || ''
-        const url = new URL(`/api/cards/${cardId}`, base)
-        const r = await fetch(url.toString(), { credentials: 'include' })
-        if (!r.ok) throw new Error(`Card ${r.status}`)
-        const j: CardResponse = await r.json()
+        const j = await fetchCard(cardId!)
         if (!canceled) {
           setCard(j)
         }
@@ -279,8 +294,9 @@ export default function CardView() {
       setShowClaimModal(false)
       setToast({ message: 'Card added to your collection!', type: 'success' })
       
-      // Refresh card data to show updated status
+      // Show the new status now, then reload the card document from the server
       setCard(prev => prev ? { ...prev, owned: true, ownedByMe: true, status: 'claimed' } : null)
+      fetchCard(cardId).then(setCard).catch(() => {})
     } catch (e: any) {
       setShowClaimModal(false)
       setToast({ message: e?.message || 'Failed to add card to collection', type: 'error' })
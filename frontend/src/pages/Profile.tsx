@@ -2,6 +2,7 @@
 import { useEffect, useState } from 'react'
 import { Link, useNavigate } from 'react-router-dom'
 import HamburgerMenu from '../components/HamburgerMenu'
+import { fetchMyCollection } from '../lib/collection'
 import './profile.css'
 
 type CollectionItem = {
@@ -53,6 +54,8 @@ function useIsMobile() {
 
 export default function Profile() {
   const [items, setItems] = useState<CollectionItem[] | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [err, setErr] = useState<string | null>(null)
   const navigate = useNavigate()
   const [user, setUser] = useState<User | null>(null)
@@ -136,27 +139,30 @@ export default function Profile() {
   }
 
   useEffect(() => {
-    const authToken = localStorage.getItem('auth_token')
-    let url = new URL('/api/collection', API).toString()
-    
-    if (authToken) {
-      // Send auth token as query parameter instead of header (Safari blocks Authorization header)
-      url += `?auth_token=${encodeURIComponent(authToken)}`
-      console.log('🔐 Sending auth token as query parameter for collection:', `${authToken.substring(0, 20)}...`)
-    } else {
-      console.log('❌ No auth token found in localStorage for collection fetch')
-    }
-    
-    console.log('🌐 Fetching /api/collection with URL:', url)
-    fetch(url, { credentials: 'include' })
-      .then(r => (r.ok ? r.json() : Promise.reject(r)))
-      .then(j => setItems(j.items || []))
+    fetchMyCollection()
+      .then(page => {
+        setItems(page.items as CollectionItem[])
+        setNextCursor(page.next_cursor)
+      })
       .catch(() => {
         setErr('Failed to load collection')
         setItems([])
       })
   }, [])
 
+  // Further pages only on request: the first page covers most collections
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    fetchMyCollection(nextCursor)
+      .then(page => {
+        setItems(prev => [...(prev || []), ...(page.items as CollectionItem[])])
+        setNextCursor(page.next_cursor)
+      })
+      .catch(() => setErr('Failed to load more cards'))
+      .finally(() => setLoadingMore(false))
+  }
+
   useEffect(() => {
     const authToken = localStorage.getItem('auth_token')
     let url = new URL('/api/auth/me', API).toString()
@@ -363,6 +369,12 @@ export default function Profile() {
         ))}
       </div>
 
+      {nextCursor && (
+        <button className="collection-load-more" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading…' : 'Load more cards'}
+        </button>
+      )}
+
       {/* Profile Header */}
       {user && (
         <div className="profile-header">
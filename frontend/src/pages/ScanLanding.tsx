@@ -8,36 +8,27 @@ export default function ScanLanding(){
 
   const [phase, setPhase] = useState('loading')   // 'loading' | 'registered'
   const [cardId, setCardId] = useState(null)
+  const [card, setCard] = useState(null)
   const [error, setError] = useState(null)
 
   useEffect(()=>{
     const base = import.meta.env.VITE_API_BASE_URL || ''
     
-    // Check if this is the new URL format (titansportshq.com/scan?t=000000000002)
-    const templateCode = sp.get('t')
-    const newTagId = sp.get('tagId') || sp.get('id') || tagId
-    const encryptedData = sp.get('data')
-    
-    let apiUrl
-    let params = new URLSearchParams()
-    
-    if (templateCode && encryptedData) {
-      // New Titan NFC verification system
-      apiUrl = new URL('/api/verification/verify', base)
-      params.set('id', newTagId || '')
-      params.set('data', encryptedData)
-      params.set('t', templateCode)
-    } else {
-      // Legacy ETRNL system
-      apiUrl = new URL('/api/scan/resolve', base)
-      if (tagId) params.set('tagId', tagId)
-      
-      // forward all possible keys we might receive from ETRNL
-      ;['enc','eCode','cmac','tt','t','template','templateId'].forEach(k=>{
-        const v = sp.get(k)
-        if (v) params.set(k, v)
-      })
-    }
+    // One endpoint for every tag type: the backend picks the verifier
+    // (SUN/ETRNL: enc eCode cmac|tt, Titan NFC: id data) from the parameters
+    const apiUrl = new URL('/api/scan', base)
+    const params = new URLSearchParams()
+    if (tagId) params.set('tagId', tagId)
+    ;['tagId','id','data','enc','eCode','cmac','tt','t','template','templateId'].forEach(k=>{
+      const v = sp.get(k)
+      if (v) params.set(k, v)
+    })
+
+    // Ask for the card document and viewer state in the same response, so the
+    // card page can render without another round-trip
+    params.set('include', 'card,viewer')
+    const authToken = localStorage.getItem('auth_token')
+    if (authToken) params.set('auth_token', authToken)
 
     const fullUrl = `${apiUrl.toString()}?${params.toString()}`
 
@@ -54,7 +45,7 @@ export default function ScanLanding(){
 
         // Handle specific verification responses
         if (j.ok === false) {
-          if (j.reason === 'not_authentic') {
+          if (j.reason === 'not_authentic' || j.reason === 'tag_mismatch') {
             setError('This card could not be verified as authentic. Please check the card and try again.')
             return
           } else if (j.reason === 'unknown_template') {
@@ -70,13 +61,14 @@ export default function ScanLanding(){
         // First-ever scan (warehouse registration)
         if (j.minted) {
           setCardId(j.cardId)
+          setCard(j.card || null)
           setPhase('registered')
           return
         }
 
         // Subsequent scans: always send to card view, which will handle claim UI
         const id = j.cardId
-        nav(`/cards/${id}`, { replace:true })
+        nav(`/cards/${id}`, { replace:true, state: { card: j.card } })
       } catch (err) {
         console.error('Verification error:', err)
         setError('Network error during verification')
@@ -136,7 +128,7 @@ export default function ScanLanding(){
           </button>
           {cardId && (
             <button
-              onClick={()=>nav(`/cards/${cardId}`, { replace:true })}
+              onClick={()=>nav(`/cards/${cardId}`, { replace:true, state: { card } })}
               style={{
                 padding:'10px 16px', borderRadius:8, border:'none',
                 background:'#111', color:'#fff', cursor:'pointer'
@@ -36,9 +36,16 @@ export default function AdminBind() {
   async function loadTemplates() {
     setLoading(true)
     try {
-      const r = await authedFetch('/api/admin/templates')
-      const j = await r.json()
-      setTemplates(j)
+      // The dropdown needs every template: follow the pages to the end
+      const all: TemplateRow[] = []
+      let offset: number | null = 0
+      while (offset !== null) {
+        const r = await authedFetch(`/api/admin/templates?limit=500&offset=${offset}`)
+        const j = await r.json()
+        all.push(...j.items)
+        offset = j.next_offset
+      }
+      setTemplates(all)
     } finally {
       setLoading(false)
     }
@@ -9,11 +9,26 @@ type TemplateRow = {
   minted_count: number
   edition_cap?: number | null
   etrnl_url_group_id?: string | null
+  template_code?: string | null
+  stats?: {
+    instances: number
+    claimed: number
+    unclaimed: number
+    shipped: number
+    scans_24h: number
+    scans_7d: number
+    remaining: number | null
+  }
 }
 
+type TemplatePage = { items: TemplateRow[]; total: number; next_offset: number | null }
+
 export default function AdminTemplates(){
   const [rows, setRows] = useState<TemplateRow[]>([])
+  const [total, setTotal] = useState(0)
+  const [nextOffset, setNextOffset] = useState<number | null>(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [token, setToken] = useState<string>(localStorage.getItem('admin_token') || '')
 
   // Point to your Flask backend (e.g., http://10.0.0.127:5001)
@@ -28,26 +43,44 @@ export default function AdminTemplates(){
     return r
   }
 
+  async function fetchPage(offset: number): Promise<TemplatePage> {
+    const r = await authedFetch(`/api/admin/templates?stats=1&offset=${offset}`)
+    return r.json()
+  }
+
+  async function loadFirstPage() {
+    setLoading(true)
+    try {
+      const page = await fetchPage(0)
+      setRows(page.items)
+      setTotal(page.total)
+      setNextOffset(page.next_offset)
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  async function loadMore() {
+    if (nextOffset === null || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const page = await fetchPage(nextOffset)
+      setRows(prev => [...prev, ...page.items])
+      setTotal(page.total)
+      setNextOffset(page.next_offset)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   function saveToken() {
     localStorage.setItem('admin_token', token)
     // refetch after saving token
-    setLoading(true)
-    authedFetch('/api/admin/templates')
-      .then(r => r.json())
-      .then(j => setRows(j))
-      .finally(() => setLoading(false))
+    loadFirstPage().catch(() => {})
   }
 
   useEffect(() => {
-    (async () => {
-      try {
-        const r = await authedFetch('/api/admin/templates')
-        const j = await r.json()
-        setRows(j)
-      } finally {
-        setLoading(false)
-      }
-    })()
+    loadFirstPage().catch(() => {})
     // re-run when token changes so a newly entered token takes effect
   }, [token])
 
@@ -70,6 +103,10 @@ export default function AdminTemplates(){
             <th align="left">Template ID</th>
             <th align="left">Version</th>
             <th align="right">Minted</th>
+            <th align="right">Claimed</th>
+            <th align="right">Unclaimed</th>
+            <th align="right">Scans 24h / 7d</th>
+            <th align="right">Remaining</th>
             <th align="left">ETRNL Group</th>
           </tr>
         </thead>
@@ -82,12 +119,28 @@ export default function AdminTemplates(){
                 {r.minted_count}
                 {r.edition_cap ? ` / ${r.edition_cap}` : ''}
               </td>
+              <td align="right">{r.stats?.claimed ?? '-'}</td>
+              <td align="right">{r.stats?.unclaimed ?? '-'}</td>
+              <td align="right">{r.stats ? `${r.stats.scans_24h} / ${r.stats.scans_7d}` : '-'}</td>
+              <td align="right">{r.stats?.remaining ?? '∞'}</td>
               <td>{r.etrnl_url_group_id || '-'}</td>
             </tr>
           ))}
         </tbody>
       </table>
 
+      <div style={{ marginTop: 12 }}>
+        Showing {rows.length} of {total}
+        {nextOffset !== null && (
+          <>
+            {' '}
+            <button onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading…' : 'Load more'}
+            </button>
+          </>
+        )}
+      </div>
+
       <div style={{ marginTop: 24 }}>
         <a href="/admin/bind">Go to “Bind by Scan”</a>
       </div>